@@ -1,30 +1,50 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
-from typing import List
 import os
-import shutil
+import sys
+
+if __name__ == "__main__":
+    # Document conversion runs on spawn process pools, whose workers re-import the __main__ module.
+    # Run as a script, this file would load YOLO, EasyOCR, the LLM and Mongo clients in every worker,
+    # so hand over to uvicorn, which imports it as "app" and leaves __main__ to itself.
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "app:app",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__)), "--host", "0.0.0.0", "--port", "8000"
+    ])
+
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from typing import List, Optional
 import uuid
+import hashlib
+import time
+import asyncio
 from datetime import datetime
-import zipfile
 from pathlib import Path
-import json
 
 # Import your existing modules
 from typing_extensions import Annotated
 from typing import TypedDict
 from langgraph.graph.message import add_messages
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.callbacks import BaseCallbackHandler
 from langgraph.graph import StateGraph, START, END
 import base64
 from dotenv import load_dotenv
 from document_processor.doc_processor import DocumentProcessor
 from similar_certificates.similarity import similarity_checker
+from similar_certificates.template_registry import TemplateRegistry
 from certificate_detection.detector import CertificateDetector  
-from ocr_checking.ocr import ocr_checker
-from database import fetch_data
-import copy
+from ocr_checking.ocr import OCREngine, TieredOCREngine, ocr_checker
+from certificate_classification.classifier import CertificateTypeClassifier
+from validation import validate_certificates, avalidate_certificates
+from database import fetch_many
+from workspace import create_workspace, get_workspace, remove_workspace
+from artifact_store import ArtifactStore
+from zip_stream import stream_zip
+from scheduler import JobScheduler, QueueFullError
+from session_store import create_session_store
+from session_events import SessionEvents, TERMINAL_EVENTS, format_sse, is_valid_callback_url, send_webhook
+from result_cache import ResultCache
+from metrics import REGISTRY, Gauge, STAGE_DURATION, LLM_REQUEST_DURATION, LLM_TOKENS, SESSIONS, CLASSIFICATIONS
+from llm_provider import create_chat_model
 from PIL import Image
 import io
 from fastapi.middleware.cors import CORSMiddleware
@@ -45,15 +65,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Create directories for storing files
-RESULTS_DIR = "results"
-os.makedirs(RESULTS_DIR, exist_ok=True)
+# Store processing results; SQLite by default so every uvicorn worker sees every session
+session_store = create_session_store()
+
+# Bounded pool that runs the pipeline; uploads are rejected with 429 once the queue is full
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "20"))
+scheduler = JobScheduler(max_workers=PIPELINE_WORKERS, max_queue_size=PIPELINE_QUEUE_SIZE)
+Gauge("verify_queue_depth", "Sessions waiting for a pipeline worker", function=lambda: scheduler.stats()["queued"])
+Gauge("verify_sessions_in_flight", "Sessions currently running through the pipeline", function=lambda: scheduler.stats()["running"])
 
-# Mount static files for downloads
-app.mount("/downloads", StaticFiles(directory=RESULTS_DIR), name="downloads")
+# Uploads are copied to disk in chunks, so memory per request stays flat whatever the file size
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_FILE_BYTES = int(os.getenv("MAX_FILE_MB", "25")) * 1024 * 1024
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_MB", "200")) * 1024 * 1024
 
-# Store processing results
-processing_results = {}
+# Progress is pushed over /events/{session_id}; the stream reads new events from the session store
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "0.5"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+
+# Optional completion callback; signed with WEBHOOK_SECRET when it is set. Only hosts listed in
+# WEBHOOK_ALLOWED_HOSTS (comma separated, ".example.com" for subdomains) are called; empty disables callbacks
+WEBHOOK_ALLOWED_HOSTS = [host.strip() for host in os.getenv("WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_RETRIES = int(os.getenv("WEBHOOK_RETRIES", "3"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "10"))
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
@@ -62,270 +98,624 @@ class State(TypedDict):
     rejected_certi: list
     accepted_certi: list
     ocr_texts: dict
+    workspace: dict
+    sources: dict
+    classifications: dict
+    extracted_fields: dict
+    comparisons: dict
+    # Certificates whose verdict comes from an error or fallback rather than a definite check; never cached
+    unverified: list
+    template_matches: dict
+    artifacts: ArtifactStore
+    events: SessionEvents
 
-certificate_detector = CertificateDetector()
-llm = ChatGroq(model="openai/gpt-oss-120b")
-image_llm = ChatGroq(model="meta-llama/llama-4-maverick-17b-128e-instruct")
-
-def resize_image_for_api(image_path, max_size=(1024, 1024), quality=85):
-    """Resize and compress image to reduce file size for API calls"""
-    with Image.open(image_path) as img:
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=quality, optimize=True)
-        buffer.seek(0)
-        return buffer.getvalue()
+# DETECTOR_BACKEND=onnx|openvino serves an export made with certificate_detection/export_model.py
+certificate_detector = CertificateDetector(
+    backend=os.getenv("DETECTOR_BACKEND", "pytorch"),
+    int8=os.getenv("DETECTOR_INT8", "false").lower() == "true"
+)
+DETECTION_BATCH_SIZE = int(os.getenv("DETECTION_BATCH_SIZE", "16"))
 
-def certificate_type_llm(state: State):
-    """Process documents and classify certificates - Updated to work with your existing code"""
-    print("Step 1: Processing documents and converting to PNG...")
-    processor = DocumentProcessor()
-    processed_image_path = processor.process_documents()
+# Reference layouts are hashed once; add one image per institution under similar_certificates/templates
+template_registry = TemplateRegistry()
+
+# Repeat uploads of the same bytes are answered from disk; bump PIPELINE_VERSION when models or prompts change
+PIPELINE_VERSION = os.getenv("PIPELINE_VERSION", "1")
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+result_cache = ResultCache(
+    cache_dir=os.getenv("RESULT_CACHE_DIR", "./result_cache"),
+    version=PIPELINE_VERSION,
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_MB", "1024")) * 1024 * 1024,
+    ttl_seconds=int(os.getenv("RESULT_CACHE_TTL_HOURS", "168")) * 3600
+)
+
+# One EasyOCR reader per concurrent OCR call; weights are loaded once and reused by every session
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "1"))
+ocr_engine = OCREngine(pool_size=OCR_POOL_SIZE)
+# "easyocr" always uses EasyOCR. "tiered" (opt-in until its escalation accuracy is measured with
+# benchmarks/run_benchmarks.py --ocr-mode tiered) reads with Tesseract first and hands only poorly read pages to EasyOCR
+OCR_MODE = os.getenv("OCR_MODE", "easyocr")
+if OCR_MODE == "tiered":
+    ocr_engine = TieredOCREngine(
+        ocr_engine,
+        min_hit_rate=float(os.getenv("OCR_MIN_HIT_RATE", "0.2")),
+        min_anchors=int(os.getenv("OCR_MIN_ANCHORS", "2")),
+        min_confidence=float(os.getenv("OCR_MIN_CONFIDENCE", "60")),
+        dictionary_path=os.getenv("OCR_DICTIONARY_PATH")
+    )
+ocr_engine.warmup()
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """Records the latency and token usage of every call made through a chat model"""
     
-    processed_folder = "./processed_certificates"
-    if not os.path.exists(processed_folder):
-        error_msg = "Processed certificates folder not found."
-        state["messages"].append({"role": "assistant", "content": error_msg})
-        return state
+    run_inline = True
     
-    png_files = [f for f in os.listdir(processed_folder) if f.lower().endswith('.png')]
+    def __init__(self, model):
+        self.model = model
+        self._starts = {}
     
-    if not png_files:
-        error_msg = "No processed PNG files found."
-        state["messages"].append({"role": "assistant", "content": error_msg})
-        return state
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
     
-    print(f"Found {len(png_files)} processed certificate(s) to classify")
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
     
-    print("Step 2: Classifying all certificates...")
-    classified_human = []
-    classified_ecerti = []
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "success")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], model=self.model, kind=kind)
     
-    for png_file in png_files:
-        image_path = os.path.join(processed_folder, png_file)
-        
-        print(f"Classifying: {png_file}")
-        
-        try:
-            compressed_image_data = resize_image_for_api(image_path)
-            img_b64 = base64.b64encode(compressed_image_data).decode("utf-8")
-            
-            if len(img_b64) > 4_000_000:
-                print(f"Warning: {png_file} is still large after compression")
-                compressed_image_data = resize_image_for_api(image_path, max_size=(512, 512), quality=60)
-                img_b64 = base64.b64encode(compressed_image_data).decode("utf-8")
-            
-            # Use LLM classification for all images
-            prompt = [
-                {"role": "system", "content": "You are an assistant that classifies certificate type. Don't give me any extra information, just tell me whether the certificate is ecertificate or normal human clicked image of the certificate"},
-                {"role": "user", "content": [
-                    {"type": "text", "text": "Classify this certificate:"},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}}
-                ]}
-            ]
-
-            response = image_llm.invoke(prompt)
-            classification = response.content
-            
-            if("ecertificate" in classification.lower()):
-                classified_ecerti.append(png_file)
-                print(f"Certificate {png_file} classified as e-certificate")
-            else:
-                classified_human.append(png_file)
-                print(f"Certificate {png_file} classified as human-clicked")
-            
-            state["messages"].append({
-                "role": "assistant", 
-                "content": f"Certificate: {png_file} | Classification: {classification}"
-            })
-            
-        except Exception as e:
-            error_msg = f"Error processing {png_file}: {str(e)}"
-            print(error_msg)
-            state["messages"].append({
-                "role": "assistant", 
-                "content": error_msg
-            })
-            continue
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
     
-    # Step 3: Perform object detection on human-clicked images
+    def _finish(self, run_id, outcome):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model=self.model, outcome=outcome)
+
+LLM_MODEL = "openai/gpt-oss-120b"
+IMAGE_LLM_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+# LLM_PROVIDER=fake swaps both for a local rule-based model, for offline load tests
+llm = create_chat_model(LLM_MODEL, callbacks=[LLMMetricsHandler(LLM_MODEL)])
+image_llm = create_chat_model(IMAGE_LLM_MODEL, callbacks=[LLMMetricsHandler(IMAGE_LLM_MODEL)])
+
+# "async" overlaps the per-certificate LLM calls of a session, at most LLM_CONCURRENCY at a time
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "sync")
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+
+# Pages the local classifier is sure about skip the vision LLM. Off by default: the built-in weights are
+# hand-set, so enable it only with weights fitted and checked on held-out data (certificate_classification/evaluate.py)
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "false").lower() == "true"
+certificate_classifier = CertificateTypeClassifier(
+    weights_path=os.getenv("CLASSIFIER_WEIGHTS_PATH", "./certificate_classification/weights.json"),
+    threshold=float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.85"))
+)
+
+def resize_image_for_api(image, max_size=(1024, 1024), quality=85):
+    """Resize and compress an RGB PIL image to reduce file size for API calls"""
+    img = image.copy()
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+# PDF pages are rendered at PDF_RENDER_DPI; multi-page PDFs are split across PDF_RENDER_WORKERS processes
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "144"))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Uploads with several files are converted DOC_CONVERT_WORKERS at a time; files and PDF pages share one process pool
+DOC_CONVERT_WORKERS = int(os.getenv("DOC_CONVERT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+def iter_certificates(state: State):
+    """Decode the uploaded documents into the session's artifact store, yielding each page as soon as it is ready"""
+    print("Step 1: Processing documents and converting to PNG...")
+    workspace = state["workspace"]
+    processor = DocumentProcessor(
+        certificate_folder=workspace["certificates"],
+        output_folder=workspace["processed"],
+        pdf_dpi=PDF_RENDER_DPI,
+        render_workers=PDF_RENDER_WORKERS,
+        convert_workers=DOC_CONVERT_WORKERS
+    )
+    
+    for file_path, png_file in processor.iter_documents(state["artifacts"]):
+        # Remember which upload every processed certificate came from
+        state["sources"][png_file] = os.path.basename(file_path)
+        yield png_file
+
+def record_no_certificates(state: State):
+    error_msg = "No processed PNG files found."
+    state["messages"].append({"role": "assistant", "content": error_msg})
+
+def local_classification(state: State, png_file):
+    """Certificate type from the local classifier, or None when the vision LLM has to decide"""
+    if not LOCAL_CLASSIFIER_ENABLED:
+        return None
+    source = state["sources"].get(png_file)
+    source_path = os.path.join(state["workspace"]["certificates"], source) if source else None
+    label, probability = certificate_classifier.classify(state["artifacts"].get(png_file), source_path)
+    if label is None:
+        print(f"Local classifier unsure about {png_file} (p={probability:.2f}), asking the LLM")
+        return None
+    CLASSIFICATIONS.inc(method="local")
+    return "ecertificate" if label == "ecertificate" else "human clicked image"
+
+def build_classification_prompt(artifacts, png_file):
+    """Build the vision prompt that asks whether a certificate is an e-certificate"""
+    image = artifacts.pil(png_file)
+    compressed_image_data = resize_image_for_api(image)
+    img_b64 = base64.b64encode(compressed_image_data).decode("utf-8")
+    
+    if len(img_b64) > 4_000_000:
+        print(f"Warning: {png_file} is still large after compression")
+        compressed_image_data = resize_image_for_api(image, max_size=(512, 512), quality=60)
+        img_b64 = base64.b64encode(compressed_image_data).decode("utf-8")
+    
+    return [
+        {"role": "system", "content": "You are an assistant that classifies certificate type. Don't give me any extra information, just tell me whether the certificate is ecertificate or normal human clicked image of the certificate"},
+        {"role": "user", "content": [
+            {"type": "text", "text": "Classify this certificate:"},
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{img_b64}"}}
+        ]}
+    ]
+
+def record_classification(state: State, png_file, classification, classified_human, classified_ecerti):
+    """Sort a classified certificate into the human-clicked or e-certificate list"""
+    if("ecertificate" in classification.lower()):
+        classified_ecerti.append(png_file)
+        state["classifications"][png_file] = "ecertificate"
+        print(f"Certificate {png_file} classified as e-certificate")
+    else:
+        classified_human.append(png_file)
+        state["classifications"][png_file] = "human"
+        print(f"Certificate {png_file} classified as human-clicked")
+    
+    state["messages"].append({
+        "role": "assistant", 
+        "content": f"Certificate: {png_file} | Classification: {classification}"
+    })
+
+def record_classification_error(state: State, png_file, error):
+    error_msg = f"Error processing {png_file}: {str(error)}"
+    print(error_msg)
+    state["messages"].append({
+        "role": "assistant", 
+        "content": error_msg
+    })
+
+def detect_human_certificates(state: State, classified_human):
+    """Crop the certificates out of human-clicked photos, keeping the original when nothing is found"""
     print("Step 3: Performing object detection on human-clicked images...")
+    artifacts = state["artifacts"]
     final_human_certificates = []
     
-    for human_cert in classified_human:
-        image_path = os.path.join(processed_folder, human_cert)
-        
-        print(f"Processing {human_cert} for object detection...")
-        
-        cropped_paths = certificate_detector.detect_and_crop_certificates(
-            image_path=image_path,
-            output_folder=processed_folder
-        )
-        
-        if cropped_paths:
-            print(f"Object detection successful for {human_cert}, found {len(cropped_paths)} certificates")
+    # One batched forward pass for every photo of the session
+    print(f"Processing {len(classified_human)} image(s) for object detection...")
+    all_crops = certificate_detector.detect_and_crop_batch(
+        [artifacts.get(human_cert) for human_cert in classified_human],
+        [Path(human_cert).stem for human_cert in classified_human],
+        batch_size=DETECTION_BATCH_SIZE
+    )
+    
+    for human_cert, crops in zip(classified_human, all_crops):
+        if crops:
+            print(f"Object detection successful for {human_cert}, found {len(crops)} certificates")
             
-            original_path = os.path.join(processed_folder, human_cert)
-            if os.path.exists(original_path):
-                os.remove(original_path)
-                print(f"Removed original file: {human_cert}")
+            artifacts.remove(human_cert)
+            print(f"Removed original image: {human_cert}")
             
-            # Extract just filenames from full paths
-            final_human_certificates.extend([os.path.basename(path) for path in cropped_paths])
+            cropped_files = []
+            for cropped_file, cropped_cert in crops:
+                artifacts.put(cropped_file, cropped_cert)
+                cropped_files.append(cropped_file)
+            final_human_certificates.extend(cropped_files)
+            for cropped_file in cropped_files:
+                state["sources"][cropped_file] = state["sources"].get(human_cert)
         else:
             print(f"No certificates detected in {human_cert}, keeping original")
             final_human_certificates.append(human_cert)
     
+    return final_human_certificates
+
+def record_certificate_types(state: State, final_human_certificates, classified_ecerti):
     state["human"] = final_human_certificates
     state["ecerti"] = classified_ecerti
     
     print(f"Final classification - Human: {len(final_human_certificates)}, E-certificates: {len(classified_ecerti)}")
     print(f"Human certificates: {final_human_certificates}")
     print(f"E-certificates: {classified_ecerti}")
+
+def certificate_type_llm(state: State):
+    """Process documents and classify certificates - Updated to work with your existing code"""
+    print("Step 2: Classifying certificates as their pages are rendered...")
+    png_files = []
+    classified_human = []
+    classified_ecerti = []
+    
+    for png_file in iter_certificates(state):
+        png_files.append(png_file)
+        print(f"Classifying: {png_file}")
+        
+        try:
+            classification = local_classification(state, png_file)
+            if classification is None:
+                prompt = build_classification_prompt(state["artifacts"], png_file)
+                classification = image_llm.invoke(prompt).content
+                CLASSIFICATIONS.inc(method="llm")
+            record_classification(state, png_file, classification, classified_human, classified_ecerti)
+        except Exception as e:
+            record_classification_error(state, png_file, e)
+            continue
+    
+    if not png_files:
+        record_no_certificates(state)
+        return state
+    
+    # Step 3: Perform object detection on human-clicked images
+    final_human_certificates = detect_human_certificates(state, classified_human)
+    record_certificate_types(state, final_human_certificates, classified_ecerti)
+    
+    return state
+
+async def acertificate_type_llm(state: State):
+    """Async variant of certificate_type_llm that classifies every certificate concurrently"""
+    print(f"Step 2: Classifying certificates as their pages are rendered (up to {LLM_CONCURRENCY} at a time)...")
+    semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    rendered = asyncio.Queue()
+    
+    def render_pages():
+        # Runs in a worker thread and hands every page to the event loop as soon as it exists
+        try:
+            for png_file in iter_certificates(state):
+                loop.call_soon_threadsafe(rendered.put_nowait, png_file)
+        finally:
+            loop.call_soon_threadsafe(rendered.put_nowait, None)
+    
+    async def classify(png_file):
+        print(f"Classifying: {png_file}")
+        classification = await asyncio.to_thread(local_classification, state, png_file)
+        if classification is not None:
+            return classification
+        async with semaphore:
+            prompt = await asyncio.to_thread(build_classification_prompt, state["artifacts"], png_file)
+            response = await image_llm.ainvoke(prompt)
+            CLASSIFICATIONS.inc(method="llm")
+            return response.content
+    
+    renderer = asyncio.ensure_future(asyncio.to_thread(render_pages))
+    png_files = []
+    tasks = []
+    while (png_file := await rendered.get()) is not None:
+        png_files.append(png_file)
+        tasks.append(asyncio.ensure_future(classify(png_file)))
+    await renderer
+    
+    responses = await asyncio.gather(*tasks, return_exceptions=True)
+    if not png_files:
+        record_no_certificates(state)
+        return state
+    
+    classified_human = []
+    classified_ecerti = []
+    for png_file, response in zip(png_files, responses):
+        if isinstance(response, Exception):
+            record_classification_error(state, png_file, response)
+        else:
+            record_classification(state, png_file, response, classified_human, classified_ecerti)
+    
+    # Step 3: Detection is CPU bound, keep it off the event loop
+    final_human_certificates = await asyncio.to_thread(detect_human_certificates, state, classified_human)
+    record_certificate_types(state, final_human_certificates, classified_ecerti)
     
     return state
 
 def similarity_checking_llm(state: State):
     """Updated similarity checker to work with your existing code"""
     try:
-        similarity_checker(state)
+        similarity_checker(state, template_registry)
         return state
     except Exception as e:
         print(f"Error in similarity checking: {e}")
         # If similarity check fails, move all to rejected for safety
         state["rejected_certi"].extend(state["human"] + state["ecerti"])
+        state["unverified"].extend(state["human"] + state["ecerti"])
         state["human"] = []
         state["ecerti"] = []
         return state
 
+async def asimilarity_checking_llm(state: State):
+    return await asyncio.to_thread(similarity_checking_llm, state)
+
 def ocr_llm(state: State):
     """Updated OCR function to work with your existing code"""
     try:
-        ocr_checker(state)
+        ocr_checker(state, ocr_engine)
         return state
     except Exception as e:
         print(f"Error in OCR processing: {e}")
         # Initialize empty OCR texts if OCR fails
         state["ocr_texts"] = {}
+        state["unverified"].extend(state["accepted_certi"])
         return state
 
+async def aocr_llm(state: State):
+    return await asyncio.to_thread(ocr_llm, state)
+
 def validation_llm(state: State):
     """Validate certificates against database"""
-    for certi, ocr_text in state["ocr_texts"].items():
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are an assistant that extracts structured fields from OCR text of certificates.
-            Return only valid JSON with fields: EnrollmentNo, Name, Course, CGPA"""),
-            ("user", f"OCR Text: {ocr_text}")
-        ])
-        
-        chain = prompt | llm
-        response = chain.invoke({})
-        try:
-            ocr_data = json.loads(response.content)  
-        except:
-            ocr_data = {"EnrollmentNo": None, "Name": None, "Course": None, "CGPA": None}
+    return validate_certificates(state, llm, fetch_many)
 
-        enrollmentNo = ocr_data.get("EnrollmentNo")
-        db_record = fetch_data(str(enrollmentNo)) if enrollmentNo else None
-        
-        if db_record:
-            db_record_copy = copy.deepcopy(db_record)
-            if "_id" in db_record_copy:
-                db_record_copy["_id"] = str(db_record_copy["_id"])
-            
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a checking AI. Check whether the data in the certificate 
-                and the data in database are same or not. If same then return true, else return false. 
-                Have strict checking for key sections like enrollment number, but you can be slightly 
-                lenient for names and other non-important sections."""),
-                ("user", "database data: {db_record_copy}, certificate data: {ocr_data}")
-            ])
-            
-            chain = prompt | llm
-            output = chain.invoke({
-                "db_record_copy": json.dumps(db_record_copy),
-                "ocr_data": json.dumps(ocr_data)
-            })
-            text = output.content.lower()
-            
-            if "true" in text:
-                if certi not in state["accepted_certi"]:
-                    state["accepted_certi"].append(certi)
-                if certi in state["rejected_certi"]:
-                    state["rejected_certi"].remove(certi)
-            else:
-                if certi in state["accepted_certi"]:
-                    state["accepted_certi"].remove(certi)
-                if certi not in state["rejected_certi"]:
-                    state["rejected_certi"].append(certi)
-        else:
-            if certi in state["accepted_certi"]:
-                state["accepted_certi"].remove(certi)
-            if certi not in state["rejected_certi"]:
-                state["rejected_certi"].append(certi)
-    
-    return state
+async def avalidation_llm(state: State):
+    """Async variant of validation_llm that validates every certificate concurrently"""
+    return await avalidate_certificates(state, llm, fetch_many, asyncio.Semaphore(LLM_CONCURRENCY))
 
 def selector_llm(state: State):
-    """Move certificates to appropriate folders"""
-    curr_path = "./processed_certificates"
-    accepted_path = "./accepted_certificates"
-    rejected_path = "./rejected_certificates"
+    """Write certificates to the accepted and rejected folders; the only PNG writes of the pipeline"""
+    workspace = state["workspace"]
+    artifacts = state["artifacts"]
+    accepted_path = workspace["accepted"]
+    rejected_path = workspace["rejected"]
 
     os.makedirs(accepted_path, exist_ok=True)
     os.makedirs(rejected_path, exist_ok=True)
 
     for certi in state["accepted_certi"]:
-        src = os.path.join(curr_path, certi)
-        dst = os.path.join(accepted_path, certi)
-        if os.path.exists(src):
-            with Image.open(src) as img:
-                img.save(dst, 'PNG')
+        if certi in artifacts:
+            artifacts.save(certi, os.path.join(accepted_path, certi))
 
     for certi in state["rejected_certi"]:
-        src = os.path.join(curr_path, certi)
-        dst = os.path.join(rejected_path, certi)
-        if os.path.exists(src):
-            with Image.open(src) as img:
-                img.save(dst, 'PNG')
+        if certi in artifacts:
+            artifacts.save(certi, os.path.join(rejected_path, certi))
 
     return state
 
-def clean_directories():
-    """Clean up directories before processing"""
-    directories_to_clean = [
-        "./certificates",
-        "./processed_certificates",
-        "./accepted_certificates", 
-        "./rejected_certificates"
-    ]
+# Node name, node function and the step label shown in /status, in execution order
+PIPELINE_STAGES = [
+    ("certificate_type_node", certificate_type_llm, "Document Processing & Classification"),
+    ("similarity_checking_node", similarity_checking_llm, "Similarity Checking"),
+    ("ocr_node", ocr_llm, "Text Extraction (OCR)"),
+    ("validation_node", validation_llm, "Database Validation"),
+    ("selector_node", selector_llm, "Sorting Certificates"),
+]
+ASYNC_PIPELINE_STAGES = [
+    ("certificate_type_node", acertificate_type_llm, "Document Processing & Classification"),
+    ("similarity_checking_node", asimilarity_checking_llm, "Similarity Checking"),
+    ("ocr_node", aocr_llm, "Text Extraction (OCR)"),
+    ("validation_node", avalidation_llm, "Database Validation"),
+    ("selector_node", selector_llm, "Sorting Certificates"),
+]
+STAGE_LABELS = {name: label for name, _, label in PIPELINE_STAGES}
+
+def build_pipeline_graph(stages):
+    """Build and compile the processing graph as a linear chain of stages"""
+    graph_builder = StateGraph(State)
     
-    for directory in directories_to_clean:
-        if os.path.exists(directory):
-            shutil.rmtree(directory)
-        os.makedirs(directory, exist_ok=True)
+    previous = START
+    for name, node, _ in stages:
+        graph_builder.add_node(name, node)
+        graph_builder.add_edge(previous, name)
+        previous = name
+    graph_builder.add_edge(previous, END)
+    
+    return graph_builder.compile()
+
+# Compiled once at startup and shared by every session
+pipeline_graph = build_pipeline_graph(PIPELINE_STAGES)
+async_pipeline_graph = build_pipeline_graph(ASYNC_PIPELINE_STAGES)
+
+class StageTracker:
+    """Keeps the session step and per-stage timings up to date as graph nodes finish, and publishes them as events"""
+    
+    def __init__(self, session_id: str, events: SessionEvents):
+        self.session_id = session_id
+        self.events = events
+        self.stage_names = [name for name, _, _ in PIPELINE_STAGES]
+        self.stage_timings = {}
+        session_store.update(session_id, step=STAGE_LABELS[self.stage_names[0]], stage_timings=self.stage_timings)
+        self.events.emit("stage", stage=self.stage_names[0], label=STAGE_LABELS[self.stage_names[0]], status="started")
+        self.stage_start = time.time()
+    
+    def node_finished(self, chunk):
+        for node_name, update in chunk.items():
+            elapsed = time.time() - self.stage_start
+            self.stage_timings[node_name] = round(elapsed, 3)
+            STAGE_DURATION.observe(elapsed, stage=node_name)
+            print(f"[{self.session_id}] {STAGE_LABELS[node_name]} finished in {elapsed:.3f} seconds")
+            self.events.emit("stage", stage=node_name, label=STAGE_LABELS[node_name], status="finished", elapsed=round(elapsed, 3))
+            
+            # Stages before validation reject certificates outright; report those too
+            if isinstance(update, dict):
+                self.events.report_verdicts(update)
+            
+            next_index = self.stage_names.index(node_name) + 1
+            if next_index < len(self.stage_names):
+                next_stage = self.stage_names[next_index]
+                session_store.update(
+                    self.session_id,
+                    step=STAGE_LABELS[next_stage],
+                    stage_timings=self.stage_timings
+                )
+                self.events.emit("stage", stage=next_stage, label=STAGE_LABELS[next_stage], status="started")
+            else:
+                session_store.update(self.session_id, stage_timings=self.stage_timings)
+        self.stage_start = time.time()
+
+def run_pipeline_graph(session_id: str, state: dict):
+    """Stream the graph and return the final state"""
+    if PIPELINE_MODE == "async":
+        return asyncio.run(arun_pipeline_graph(session_id, state))
+    
+    tracker = StageTracker(session_id, state["events"])
+    final_state = state
+    for mode, chunk in pipeline_graph.stream(state, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            tracker.node_finished(chunk)
+    
+    return final_state
+
+async def arun_pipeline_graph(session_id: str, state: dict):
+    tracker = StageTracker(session_id, state["events"])
+    final_state = state
+    async for mode, chunk in async_pipeline_graph.astream(state, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            tracker.node_finished(chunk)
+    
+    return final_state
+
+def store_results_in_cache(final_state, file_hashes, output_stems):
+    """
+    Cache the stage outputs of every upload that produced at least one final certificate
+
+    Uploads with a certificate whose verdict came from an error or fallback (see
+    State.unverified) are left out, so a passing outage is not replayed for days.
+    """
+    workspace = final_state["workspace"]
+    entries = {}
+    skipped = {final_state["sources"].get(certi) for certi in final_state["unverified"]}
+    
+    for verdict, certificates, folder in [
+        ("accepted", final_state["accepted_certi"], workspace["accepted"]),
+        ("rejected", final_state["rejected_certi"], workspace["rejected"])
+    ]:
+        for certi in certificates:
+            source = final_state["sources"].get(certi)
+            path = os.path.join(folder, certi)
+            if source not in file_hashes or source in skipped or not os.path.exists(path):
+                continue
+            
+            # Certificate names start with the upload's output stem; stored so a later hit can rename them
+            entry, files = entries.setdefault(source, ({"stem": output_stems[source], "classifications": {}, "certificates": {}}, {}))
+            # One classification per rendered page of the upload
+            entry["classifications"] = {
+                page: classification for page, classification in final_state["classifications"].items()
+                if final_state["sources"].get(page) == source
+            }
+            entry["certificates"][certi] = {
+                "verdict": verdict,
+                "ocr_text": final_state["ocr_texts"].get(certi),
+                "fields": final_state["extracted_fields"].get(certi),
+                "comparison": final_state["comparisons"].get(certi)
+            }
+            files[certi] = path
+    
+    for source in skipped & set(file_hashes):
+        print(f"Not caching results for {source}: a verdict came from a failed or fallback check")
+    
+    for source, (entry, files) in entries.items():
+        try:
+            result_cache.put(file_hashes[source], entry, files)
+        except Exception as e:
+            print(f"Could not cache results for {source}: {e}")
+
+def restore_cached_entry(workspace, filename, entry, stem):
+    """
+    Copy the certificates of a cache hit into the session's accepted and rejected folders
+
+    The cached names come from whichever upload filled the entry, so they are
+    renamed to this upload's output stem.
+
+    Returns:
+        {certificate name: cached details}, or None when the entry was evicted
+        while copying, which the caller treats as a miss
+    """
+    restored = {}
+    copied = []
+    try:
+        for cached_name, details in entry["certificates"].items():
+            certi = stem + cached_name[len(entry["stem"]):]
+            folder = workspace["accepted"] if details["verdict"] == "accepted" else workspace["rejected"]
+            destination = os.path.join(folder, certi)
+            result_cache.restore_file(entry, cached_name, destination)
+            copied.append(destination)
+            restored[certi] = details
+    except FileNotFoundError:
+        print(f"Cache entry for {filename} was evicted while restoring it, processing the file again")
+        for destination in copied:
+            os.remove(destination)
+        return None
+    return restored
+
+def merge_cached_results(state: State, cached_results):
+    """Add the restored certificates of cache hits to the final state"""
+    for filename, certificates in cached_results.items():
+        for certi, details in certificates.items():
+            if details["verdict"] == "accepted":
+                certificates_list = state["accepted_certi"]
+            else:
+                certificates_list = state["rejected_certi"]
+            
+            state["sources"][certi] = filename
+            if certi not in certificates_list:
+                certificates_list.append(certi)
+            if details["ocr_text"] is not None:
+                state["ocr_texts"][certi] = details["ocr_text"]
+            if details["fields"] is not None:
+                state["extracted_fields"][certi] = details["fields"]
+            if details.get("comparison") is not None:
+                state["comparisons"][certi] = details["comparison"]
+
+def notify_callback(session_id: str):
+    """POST the final status of a session to the callback_url given at upload, if any"""
+    result = session_store.get(session_id)
+    if not result or not result.get("callback_url"):
+        return
+    
+    payload = {
+        "session_id": session_id,
+        "status": result["status"],
+        "accepted_count": result.get("accepted_count", 0),
+        "rejected_count": result.get("rejected_count", 0),
+        "accepted_certificates": result.get("accepted_certificates", []),
+        "rejected_certificates": result.get("rejected_certificates", []),
+        "results_url": f"/results/{session_id}",
+        "accepted_download_url": result.get("accepted_download_url"),
+        "rejected_download_url": result.get("rejected_download_url"),
+        "error": result.get("error")
+    }
+    send_webhook(
+        result["callback_url"], payload, WEBHOOK_SECRET, WEBHOOK_RETRIES, WEBHOOK_TIMEOUT, allowed_hosts=WEBHOOK_ALLOWED_HOSTS,
+        on_done=lambda delivered: session_store.update(session_id, webhook_delivered=delivered)
+    )
 
 def process_certificates_pipeline(session_id: str, file_data: List[dict]):
     """Main processing pipeline"""
+    events = SessionEvents(session_store, session_id)
     try:
-        # Clean directories first
-        clean_directories()
+        # Uploads were streamed into the session's certificates folder (where DocumentProcessor expects them)
+        workspace = get_workspace(session_id)
+        certificates_dir = workspace["certificates"]
         
-        # Save files to certificates folder (where DocumentProcessor expects them)
-        certificates_dir = "./certificates"
+        # Uploads seen before are answered from the result cache, the rest go through the graph.
+        # Cached certificates are renamed after this session's uploads; stems over every upload keep them apart.
+        stem_namer = DocumentProcessor(certificate_folder=certificates_dir, output_folder=workspace["processed"])
+        session_stems = stem_namer.output_stems([file_info["filename"] for file_info in file_data])
+        file_hashes = {}
+        cached_results = {}
+        new_files = []
         for file_info in file_data:
-            file_path = os.path.join(certificates_dir, file_info["filename"])
-            with open(file_path, "wb") as buffer:
-                buffer.write(file_info["content"])
+            filename = file_info["filename"]
+            file_hashes[filename] = file_info["sha256"]
+            entry = result_cache.get(file_info["sha256"]) if RESULT_CACHE_ENABLED else None
+            restored = None
+            if entry and "stem" in entry:
+                restored = restore_cached_entry(workspace, filename, entry, session_stems[filename])
+            if restored is not None:
+                cached_results[filename] = restored
+                os.remove(os.path.join(certificates_dir, filename))
+            else:
+                new_files.append(file_info)
         
-        print(f"[{session_id}] Saved {len(file_data)} files to certificates directory")
+        if cached_results:
+            print(f"[{session_id}] {len(cached_results)} file(s) served from the result cache")
+        
+        print(f"[{session_id}] {len(new_files)} file(s) to process in certificates directory")
         
         # Initialize state
         state = {
@@ -334,89 +724,168 @@ def process_certificates_pipeline(session_id: str, file_data: List[dict]):
             "human": [],
             "rejected_certi": [],
             "accepted_certi": [],
-            "ocr_texts": {}
+            "ocr_texts": {},
+            "workspace": workspace,
+            "sources": {},
+            "classifications": {},
+            "extracted_fields": {},
+            "comparisons": {},
+            "unverified": [],
+            "template_matches": {},
+            "artifacts": ArtifactStore(),
+            "events": events
         }
         
-        # Build and execute the processing graph
-        graph_builder = StateGraph(State)
-        
-        graph_builder.add_node("certificate_type_node", certificate_type_llm)
-        graph_builder.add_node("similarity_checking_node", similarity_checking_llm)
-        graph_builder.add_node("ocr_node", ocr_llm)
-        graph_builder.add_node("validation_node", validation_llm)
-        graph_builder.add_node("selector_node", selector_llm)
-        
-        graph_builder.add_edge(START, "certificate_type_node")
-        graph_builder.add_edge("certificate_type_node", "similarity_checking_node")
-        graph_builder.add_edge("similarity_checking_node", "ocr_node")
-        graph_builder.add_edge("ocr_node", "validation_node")
-        graph_builder.add_edge("validation_node", "selector_node")
-        graph_builder.add_edge("selector_node", END)
-        
-        graph = graph_builder.compile()
-        
-        print(f"[{session_id}] Starting processing pipeline...")
-        
         # Execute the pipeline
-        processing_results[session_id]["status"] = "processing"
-        processing_results[session_id]["step"] = "Document Processing & Classification"
-        
-        final_state = graph.invoke(state)
-        
-        # Create ZIP files for download
-        accepted_zip_path = create_zip_file("./accepted_certificates", f"accepted_certificates_{session_id}.zip")
-        rejected_zip_path = create_zip_file("./rejected_certificates", f"rejected_certificates_{session_id}.zip")
+        session_store.update(session_id, status="processing")
+        events.emit("status", status="processing")
+        if new_files:
+            print(f"[{session_id}] Starting processing pipeline...")
+            final_state = run_pipeline_graph(session_id, state)
+            if RESULT_CACHE_ENABLED:
+                # The pipeline names its outputs by stems over the files it processed
+                output_stems = stem_namer.output_stems([file_info["filename"] for file_info in new_files])
+                store_results_in_cache(final_state, file_hashes, output_stems)
+        else:
+            final_state = state
+        merge_cached_results(final_state, cached_results)
+        events.report_verdicts(final_state)
         
         # Update final results
-        processing_results[session_id].update({
-            "status": "completed",
-            "step": "Completed",
-            "accepted_count": len(final_state["accepted_certi"]),
-            "rejected_count": len(final_state["rejected_certi"]),
-            "accepted_certificates": final_state["accepted_certi"],
-            "rejected_certificates": final_state["rejected_certi"],
-            "accepted_download_url": f"/downloads/accepted_certificates_{session_id}.zip" if accepted_zip_path else None,
-            "rejected_download_url": f"/downloads/rejected_certificates_{session_id}.zip" if rejected_zip_path else None,
-            "ocr_texts": final_state["ocr_texts"]
-        })
+        session_store.update(
+            session_id,
+            status="completed",
+            step="Completed",
+            accepted_count=len(final_state["accepted_certi"]),
+            rejected_count=len(final_state["rejected_certi"]),
+            accepted_certificates=final_state["accepted_certi"],
+            rejected_certificates=final_state["rejected_certi"],
+            accepted_download_url=f"/download/{session_id}/accepted" if os.listdir(workspace["accepted"]) else None,
+            rejected_download_url=f"/download/{session_id}/rejected" if os.listdir(workspace["rejected"]) else None,
+            ocr_texts=final_state["ocr_texts"],
+            template_matches=final_state["template_matches"],
+            comparisons=final_state["comparisons"],
+            cached_files=list(cached_results)
+        )
         
         print(f"[{session_id}] Processing completed successfully!")
         print(f"[{session_id}] Accepted: {len(final_state['accepted_certi'])}")
         print(f"[{session_id}] Rejected: {len(final_state['rejected_certi'])}")
+        events.emit(
+            "completed",
+            accepted_count=len(final_state["accepted_certi"]),
+            rejected_count=len(final_state["rejected_certi"]),
+            results_url=f"/results/{session_id}"
+        )
+        SESSIONS.inc(status="completed")
         
     except Exception as e:
         print(f"[{session_id}] Error in processing: {str(e)}")
-        processing_results[session_id].update({
-            "status": "failed",
-            "error": str(e),
-            "step": "Error occurred"
-        })
+        session_store.update(
+            session_id,
+            status="failed",
+            error=str(e),
+            step="Error occurred"
+        )
+        events.emit("failed", error=str(e))
+        SESSIONS.inc(status="failed")
+    
+    notify_callback(session_id)
 
-def create_zip_file(source_dir: str, zip_filename: str) -> str:
-    """Create a ZIP file from a directory"""
-    if not os.path.exists(source_dir) or not os.listdir(source_dir):
-        return None
+def spool_filename(filename: str, taken: set) -> str:
+    """Basename of an upload, suffixed _2, _3, ... when an earlier file in the request already has it"""
+    filename = os.path.basename(filename)
+    stem, suffix = os.path.splitext(filename)
+    counter = 2
+    while filename in taken:
+        filename = f"{stem}_{counter}{suffix}"
+        counter += 1
+    taken.add(filename)
+    return filename
+
+async def spool_upload(file: UploadFile, destination: str, request_bytes: int):
+    """
+    Copy an upload to disk in chunks, hashing it on the way
+
+    Returns:
+        (sha256 hex digest, file size); raises 413 as soon as a limit is crossed
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(destination, "wb") as buffer:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_FILE_BYTES:
+                raise HTTPException(status_code=413, detail=f"File {file.filename} exceeds the {MAX_FILE_BYTES} byte limit")
+            if request_bytes + size > MAX_REQUEST_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_REQUEST_BYTES} byte request limit")
+            sha256.update(chunk)
+            buffer.write(chunk)
+    return sha256.hexdigest(), size
+
+class LimitUploadSize:
+    """
+    Reject oversized uploads before they are spooled
+
+    Content-Length is checked up front. Chunked bodies carry none, so the body
+    is also counted as it streams in and the request fails with 413 as soon as
+    it crosses the limit, instead of after the multipart parser spooled it all.
+    """
     
-    zip_path = os.path.join(RESULTS_DIR, zip_filename)
-    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for root, dirs, files in os.walk(source_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, source_dir)
-                zipf.write(file_path, arcname)
+    def __init__(self, app, path, max_bytes):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
     
-    return zip_path
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Upload exceeds the {self.max_bytes} byte request limit"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parsing, which FastAPI turns into the 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(LimitUploadSize, path="/upload-certificates/", max_bytes=MAX_REQUEST_BYTES)
 
 @app.post("/upload-certificates/")
-async def upload_certificates(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)):
-    """Upload multiple certificate files for processing"""
+async def upload_certificates(files: List[UploadFile] = File(...), callback_url: Optional[str] = Form(None)):
+    """Upload multiple certificate files for processing; callback_url is POSTed the results once done"""
     if not files or len(files) == 0:
         raise HTTPException(status_code=400, detail="No files uploaded")
     
-    # Validate file types and read file contents
-    allowed_extensions = {'.jpg', '.jpeg', '.png', '.pdf', '.doc', '.docx'}
-    file_data = []
+    if callback_url:
+        if not WEBHOOK_ALLOWED_HOSTS:
+            raise HTTPException(status_code=400, detail="callback_url is not enabled on this server")
+        # Resolves the host, so keep the DNS lookup off the event loop
+        if not await asyncio.to_thread(is_valid_callback_url, callback_url, WEBHOOK_ALLOWED_HOSTS):
+            raise HTTPException(status_code=400, detail="callback_url must be an http(s) URL on an allowed, public host")
     
+    # Reject early when the box is saturated instead of reading the uploads
+    if scheduler.is_full():
+        raise_queue_full(scheduler.retry_after())
+    
+    # Validate file types before touching the disk
+    allowed_extensions = {'.jpg', '.jpeg', '.png', '.pdf', '.doc', '.docx'}
     for file in files:
         file_ext = Path(file.filename).suffix.lower()
         if file_ext not in allowed_extensions:
@@ -424,56 +893,151 @@ async def upload_certificates(background_tasks: BackgroundTasks, files: List[Upl
                 status_code=400, 
                 detail=f"File type not supported: {file.filename}. Allowed types: {', '.join(allowed_extensions)}"
             )
-        
-        # Read file content immediately while the file is still open
-        try:
-            content = await file.read()
-            file_data.append({
-                "filename": file.filename,
-                "content": content
-            })
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Error reading file {file.filename}: {str(e)}")
+    
+    # Drop sessions past their TTL together with their files
+    for expired_session_id in session_store.evict_expired():
+        remove_session_files(expired_session_id)
     
     # Generate unique session ID
     session_id = str(uuid.uuid4())
+    workspace = create_workspace(session_id)
+    
+    # Stream every file into the session's spool folder; identical files are only kept once
+    file_data = []
+    seen_hashes = set()
+    spooled_names = set()
+    duplicate_files = []
+    request_bytes = 0
+    
+    for file in files:
+        # Same-named files get their own spool name so neither overwrites the other
+        filename = spool_filename(file.filename, spooled_names)
+        file_path = os.path.join(workspace["certificates"], filename)
+        try:
+            content_hash, size = await spool_upload(file, file_path, request_bytes)
+        except HTTPException:
+            remove_workspace(session_id)
+            raise
+        except Exception as e:
+            remove_workspace(session_id)
+            raise HTTPException(status_code=400, detail=f"Error reading file {file.filename}: {str(e)}")
+        
+        request_bytes += size
+        if content_hash in seen_hashes:
+            os.remove(file_path)
+            duplicate_files.append(filename)
+            continue
+        seen_hashes.add(content_hash)
+        file_data.append({
+            "filename": filename,
+            "sha256": content_hash,
+            "size": size
+        })
     
     # Initialize processing result
-    processing_results[session_id] = {
+    session_store.create(session_id, {
         "session_id": session_id,
         "status": "queued",
         "step": "Initializing",
         "uploaded_files": [file_info["filename"] for file_info in file_data],
         "upload_time": datetime.now().isoformat(),
         "accepted_count": 0,
-        "rejected_count": 0
-    }
+        "rejected_count": 0,
+        "callback_url": callback_url
+    })
     
-    # Start background processing
-    background_tasks.add_task(process_certificates_pipeline, session_id, file_data)
+    # Hand the job to the scheduler
+    try:
+        queue_position = scheduler.submit(session_id, process_certificates_pipeline, session_id, file_data)
+    except QueueFullError as e:
+        session_store.delete(session_id)
+        remove_workspace(session_id)
+        raise_queue_full(e.retry_after)
+    SessionEvents(session_store, session_id).emit("status", status="queued", queue_position=queue_position)
     
     return {
         "session_id": session_id,
         "message": f"Successfully queued {len(files)} files for processing",
         "status_url": f"/status/{session_id}",
-        "uploaded_files": [file_info["filename"] for file_info in file_data]
+        "events_url": f"/events/{session_id}",
+        "queue_position": queue_position,
+        "uploaded_files": [file_info["filename"] for file_info in file_data],
+        "duplicate_files": duplicate_files
     }
 
+def get_session_or_404(session_id: str) -> dict:
+    result = session_store.get(session_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return result
+
+def remove_session_files(session_id: str):
+    """Remove a session's working folders"""
+    remove_workspace(session_id)
+
+def raise_queue_full(retry_after: int):
+    """Reject an upload because the processing queue is full"""
+    raise HTTPException(
+        status_code=429,
+        detail="Processing queue is full. Please retry later.",
+        headers={"Retry-After": str(retry_after)}
+    )
+
 @app.get("/status/{session_id}")
 async def get_processing_status(session_id: str):
     """Get the processing status for a session"""
-    if session_id not in processing_results:
-        raise HTTPException(status_code=404, detail="Session not found")
+    result = get_session_or_404(session_id)
+    if result["status"] == "queued":
+        return {**result, "queue_position": scheduler.position(session_id)}
     
-    return processing_results[session_id]
+    return result
+
+async def session_event_stream(session_id: str, request: Request, last_event_id: int):
+    """Yield the session's events as SSE messages until it completes, fails or the client leaves"""
+    last_keepalive = time.time()
+    while True:
+        if await request.is_disconnected():
+            return
+        
+        events = await asyncio.to_thread(session_store.events_since, session_id, last_event_id)
+        for event in events:
+            last_event_id = event["id"]
+            yield format_sse(event)
+            if event["event"] in TERMINAL_EVENTS:
+                return
+        
+        if events:
+            last_keepalive = time.time()
+        elif await asyncio.to_thread(session_store.get, session_id) is None:
+            # Deleted or expired while the client was listening
+            return
+        elif time.time() - last_keepalive >= EVENT_KEEPALIVE_SECONDS:
+            last_keepalive = time.time()
+            yield ": keepalive\n\n"
+        
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+@app.get("/events/{session_id}")
+async def stream_session_events(session_id: str, request: Request):
+    """
+    Server-Sent Events stream of a session's progress: status changes, stage
+    transitions and per-certificate verdicts, ending with a completed or failed event
+
+    Reconnecting clients send Last-Event-ID and only receive what they missed.
+    """
+    get_session_or_404(session_id)
+    last_event_id = request.headers.get("last-event-id", "")
+    
+    return StreamingResponse(
+        session_event_stream(session_id, request, int(last_event_id) if last_event_id.isdigit() else 0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/results/{session_id}")
 async def get_results(session_id: str):
     """Get detailed results for a completed session"""
-    if session_id not in processing_results:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    result = processing_results[session_id]
+    result = get_session_or_404(session_id)
     
     if result["status"] != "completed":
         raise HTTPException(status_code=400, detail=f"Processing not completed. Current status: {result['status']}")
@@ -500,74 +1064,68 @@ async def get_results(session_id: str):
 @app.get("/download/{session_id}/{file_type}")
 async def download_results(session_id: str, file_type: str):
     """Download ZIP file of accepted or rejected certificates"""
-    if session_id not in processing_results:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    result = processing_results[session_id]
+    result = get_session_or_404(session_id)
     
     if result["status"] != "completed":
         raise HTTPException(status_code=400, detail="Processing not completed")
     
     if file_type == "accepted":
         download_url = result.get("accepted_download_url")
-        filename = f"accepted_certificates_{session_id}.zip"
     elif file_type == "rejected":
         download_url = result.get("rejected_download_url")
-        filename = f"rejected_certificates_{session_id}.zip"
     else:
         raise HTTPException(status_code=400, detail="Invalid file type. Use 'accepted' or 'rejected'")
     
     if not download_url:
         raise HTTPException(status_code=404, detail=f"No {file_type} certificates found")
     
-    file_path = os.path.join(RESULTS_DIR, filename)
+    source_dir = get_workspace(session_id)[file_type]
     
-    if not os.path.exists(file_path):
+    if not os.path.isdir(source_dir):
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
-        path=file_path,
-        filename=filename,
-        media_type='application/zip'
+    # Built on the fly from the session's certificates; no archive is written to disk
+    filename = f"{file_type}_certificates_{session_id}.zip"
+    return StreamingResponse(
+        stream_zip(source_dir),
+        media_type='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 @app.get("/sessions")
-async def list_sessions():
-    """List all processing sessions"""
+async def list_sessions(status: Optional[str] = None):
+    """List all processing sessions, optionally only those with the given status"""
     return {
         "sessions": [
             {
-                "session_id": session_id,
+                "session_id": details["session_id"],
                 "status": details["status"],
                 "upload_time": details["upload_time"],
                 "file_count": len(details["uploaded_files"]),
                 "accepted_count": details.get("accepted_count", 0),
                 "rejected_count": details.get("rejected_count", 0)
             }
-            for session_id, details in processing_results.items()
+            for details in session_store.list(status)
         ]
     }
 
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session and its files"""
-    if session_id not in processing_results:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Remove ZIP files
-    accepted_zip = f"accepted_certificates_{session_id}.zip"
-    rejected_zip = f"rejected_certificates_{session_id}.zip"
+    get_session_or_404(session_id)
     
-    for zip_file in [accepted_zip, rejected_zip]:
-        zip_path = os.path.join(RESULTS_DIR, zip_file)
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
+    remove_session_files(session_id)
     
     # Remove from processing results
-    del processing_results[session_id]
+    session_store.delete(session_id)
     
     return {"message": f"Session {session_id} deleted successfully"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics of this worker process"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 async def root():
     """API information"""
@@ -578,12 +1136,10 @@ async def root():
         "endpoints": {
             "upload": "/upload-certificates/",
             "status": "/status/{session_id}",
+            "events": "/events/{session_id}",
             "results": "/results/{session_id}",
             "download": "/download/{session_id}/{file_type}",
-            "sessions": "/sessions"
+            "sessions": "/sessions",
+            "metrics": "/metrics"
         }
     }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
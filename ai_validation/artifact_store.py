@@ -0,0 +1,72 @@
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class ArtifactStore:
+    def __init__(self):
+        """
+        Decoded certificate images shared by the pipeline stages of one session
+
+        Images are kept as BGR uint8 arrays (OpenCV convention) under their
+        certificate name, so stages hand them to each other without writing
+        and re-reading PNG files. Derived views (PIL images, encoded bytes) are
+        cached until the image is replaced or removed.
+        """
+        self._images = {}
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    def put(self, name, image):
+        with self._lock:
+            self._images[name] = image
+            self._derived.pop(name, None)
+
+    def get(self, name):
+        return self._images[name]
+
+    def remove(self, name):
+        with self._lock:
+            self._images.pop(name, None)
+            self._derived.pop(name, None)
+
+    def names(self):
+        return list(self._images)
+
+    def __contains__(self, name):
+        return name in self._images
+
+    def _cached(self, name, key, build):
+        with self._lock:
+            derived = self._derived.setdefault(name, {})
+            if key in derived:
+                return derived[key]
+        value = build(self._images[name])
+        with self._lock:
+            self._derived.setdefault(name, {})[key] = value
+        return value
+
+    def rgb(self, name):
+        """RGB view of an image, as EasyOCR and PIL expect"""
+        return self._cached(name, "rgb", lambda image: np.ascontiguousarray(image[:, :, ::-1]))
+
+    def pil(self, name):
+        return self._cached(name, "pil", lambda image: Image.fromarray(self.rgb(name)))
+
+    def save(self, name, path):
+        """Write an image to disk as PNG; only final outputs should need this"""
+        cv2.imwrite(path, self._images[name])
+
+
+def pil_to_bgr(img):
+    """Flatten a PIL image onto white and convert it to a BGR array"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.array(img)[:, :, ::-1].copy()
@@ -0,0 +1,179 @@
+# benchmarks/corpus.py
+import io
+import json
+import os
+import random
+import shutil
+import sys
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from certificate_detection.data_augmentation import ImageAugmentor
+
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Meera", "Kabir", "Ananya", "Rohan", "Saanvi", "Vivaan", "Tara"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Khan", "Reddy", "Das", "Gupta", "Nair", "Singh", "Joshi"]
+COURSES = [
+    "Bachelor of Technology in Computer Science",
+    "Bachelor of Science in Physics",
+    "Master of Business Administration",
+    "Diploma in Data Analytics",
+]
+
+CERTIFICATE_SIZE = (1600, 1131)
+
+
+def font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only ships the small bitmap font
+        return ImageFont.load_default()
+
+
+def make_records(count, rng):
+    return [
+        {
+            "enrollmentNo": f"EN{2021000 + i}",
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "course": rng.choice(COURSES),
+            "cgpa": round(rng.uniform(6.0, 9.9), 2),
+        }
+        for i in range(count)
+    ]
+
+
+def certificate_text(record):
+    """Text printed on a certificate, which is also what a perfect OCR would return"""
+    return (
+        "CERTIFICATE OF COMPLETION\n"
+        f"This is to certify that {record['name']}\n"
+        f"Enrollment No: {record['enrollmentNo']}\n"
+        f"has successfully completed {record['course']}\n"
+        f"with CGPA {record['cgpa']}"
+    )
+
+
+def render_certificate(record):
+    """Draw a clean e-certificate"""
+    image = Image.new("RGB", CERTIFICATE_SIZE, "white")
+    draw = ImageDraw.Draw(image)
+    width, height = CERTIFICATE_SIZE
+    draw.rectangle([30, 30, width - 30, height - 30], outline=(120, 90, 20), width=12)
+    draw.rectangle([60, 60, width - 60, height - 60], outline=(180, 150, 60), width=4)
+
+    lines = certificate_text(record).split("\n")
+    y = 180
+    for index, line in enumerate(lines):
+        size = 72 if index == 0 else 44
+        text_width = draw.textlength(line, font=font(size))
+        draw.text(((width - text_width) / 2, y), line, fill=(20, 20, 60), font=font(size))
+        y += 120 if index == 0 else 90
+
+    draw.line([width - 500, height - 200, width - 160, height - 200], fill=(0, 0, 0), width=3)
+    draw.text((width - 430, height - 180), "Registrar", fill=(0, 0, 0), font=font(36))
+    return image
+
+
+def photograph(certificate, rng):
+    """Simulate a phone photo of a printed certificate lying on a desk"""
+    background_color = tuple(rng.randint(60, 200) for _ in range(3))
+    background = Image.new("RGB", (2200, 1700), background_color)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 32 - 1)).integers(0, 40, (1700, 2200, 3), dtype=np.uint8)
+    background = Image.fromarray(np.clip(np.asarray(background, dtype=np.int16) + noise - 20, 0, 255).astype(np.uint8))
+
+    tilted = certificate.rotate(rng.uniform(-8, 8), expand=True, fillcolor=background_color)
+    scale = rng.uniform(0.75, 0.95)
+    tilted = tilted.resize((int(tilted.width * scale), int(tilted.height * scale)))
+    left = rng.randint(0, max(0, background.width - tilted.width))
+    top = rng.randint(0, max(0, background.height - tilted.height))
+    background.paste(tilted, (left, top))
+    return background.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0.3, 1.2)))
+
+
+def build_pdf(pages, path):
+    document = fitz.open()
+    for page_image in pages:
+        buffer = io.BytesIO()
+        page_image.save(buffer, format="PNG")
+        page = document.new_page(width=842, height=595)  # A4 landscape in points
+        page.insert_image(page.rect, stream=buffer.getvalue())
+    document.save(path)
+    document.close()
+
+
+def build_corpus(output_dir, seed=7, certificates=20, photos=5, augmentations=2, pdfs=3, pages_per_pdf=3, forged_every=4):
+    """
+    Build a reproducible synthetic corpus and return its manifest
+
+    Layout of output_dir:
+        ecertificates/   clean e-certificates (one per student)
+        photos/          desk photos of some of them, varied with ImageAugmentor
+        documents/       upload folder mixing images and multi-page PDFs
+        manifest.json    students, OCR ground truth and expected verdicts
+
+    Every forged_every-th certificate shows a name that does not match the
+    student record, so validation has something to reject.
+    """
+    rng = random.Random(seed)
+    np.random.seed(seed)
+    random.seed(seed)  # ImageAugmentor draws from the global generators
+
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    for folder in ("ecertificates", "photos", "documents", "photo_originals"):
+        (output_dir / folder).mkdir(parents=True)
+
+    records = make_records(certificates, rng)
+    manifest = {"seed": seed, "records": records, "certificates": [], "photos": [], "documents": []}
+
+    rendered = []
+    for index, record in enumerate(records):
+        shown = dict(record)
+        forged = forged_every and index % forged_every == forged_every - 1
+        if forged:
+            shown["name"] = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}x"
+        image = render_certificate(shown)
+        rendered.append(image)
+
+        filename = f"certificate_{index:03d}.png"
+        image.save(output_dir / "ecertificates" / filename)
+        manifest["certificates"].append({
+            "file": filename,
+            "enrollmentNo": record["enrollmentNo"],
+            "ocr_text": certificate_text(shown),
+            "expected": "rejected" if forged else "accepted",
+        })
+
+    augmentor = ImageAugmentor(output_dir / "photo_originals", output_dir / "photos")
+    for index in range(min(photos, len(rendered))):
+        original = output_dir / "photo_originals" / f"photo_{index:03d}.jpg"
+        photograph(rendered[index], rng).save(original, quality=90)
+        augmentor.augment_single_image(original, augmentations)
+    shutil.rmtree(output_dir / "photo_originals")
+    # The augmentor also writes an untouched copy of every photo
+    manifest["photos"] = sorted(os.listdir(output_dir / "photos"))
+
+    documents = output_dir / "documents"
+    for filename in [entry["file"] for entry in manifest["certificates"]][:max(0, certificates - pdfs * pages_per_pdf)]:
+        shutil.copy2(output_dir / "ecertificates" / filename, documents / filename)
+    for filename in manifest["photos"][:photos]:
+        shutil.copy2(output_dir / "photos" / filename, documents / filename)
+    for index in range(pdfs):
+        start = (index * pages_per_pdf) % len(rendered)
+        pages = [rendered[(start + offset) % len(rendered)] for offset in range(pages_per_pdf)]
+        build_pdf(pages, str(documents / f"bundle_{index:02d}.pdf"))
+    manifest["documents"] = sorted(os.listdir(documents))
+
+    with open(output_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(
+        f"Corpus written to {output_dir}: {len(manifest['certificates'])} e-certificates, "
+        f"{len(manifest['photos'])} photos, {len(manifest['documents'])} upload documents",
+        file=sys.stderr
+    )
+    return manifest
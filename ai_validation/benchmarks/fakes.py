@@ -0,0 +1,20 @@
+# benchmarks/fakes.py
+import time
+
+
+class InMemoryStudents:
+    def __init__(self, records, latency_seconds=0.0):
+        """Stand-in for the students collection behind database.fetch_many"""
+        self.records = {str(record["enrollmentNo"]): record for record in records}
+        self.latency_seconds = latency_seconds
+        self.queries = 0
+
+    def fetch_many(self, enrollment_nos):
+        self.queries += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return {
+            str(enrollmentNo): dict(self.records[str(enrollmentNo)])
+            for enrollmentNo in dict.fromkeys(enrollment_nos)
+            if str(enrollmentNo) in self.records
+        }
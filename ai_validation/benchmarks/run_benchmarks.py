@@ -0,0 +1,346 @@
+# benchmarks/run_benchmarks.py
+"""
+Stage-level benchmarks of the validation pipeline, fully offline
+
+Run from the ai_validation folder:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json   # exits 1 on a regression
+
+Every stage runs in its own spawned process, on the same synthetic corpus,
+so its peak RSS is its own. Validation runs the validation module with
+FakeChatModel and InMemoryStudents, without loading the app or its models;
+the detector and OCR stages need their model weights on disk.
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+STAGES = ["documents", "detector", "similarity", "ocr", "validation"]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies, wall_seconds, **extra):
+    latencies_ms = np.array(latencies) * 1000
+    report = {
+        "items": len(latencies),
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_per_second": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else None,
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        } if len(latencies) else None,
+    }
+    report.update(extra)
+    return report
+
+
+def timed(items, run):
+    """Run every item, returning per-item latencies and the wall time of the loop"""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        item_start = time.perf_counter()
+        run(item)
+        latencies.append(time.perf_counter() - item_start)
+    return latencies, time.perf_counter() - start
+
+
+def load_images(folder, filenames):
+    """Decode the corpus images into an ArtifactStore the way the pipeline does"""
+    from artifact_store import ArtifactStore
+    from document_processor.doc_processor import DocumentProcessor
+
+    processor = DocumentProcessor(certificate_folder=folder, output_folder=tempfile.mkdtemp())
+    store = ArtifactStore()
+    for filename in filenames:
+        store.put(filename, processor.convert_image_to_array(os.path.join(folder, filename)))
+    return store
+
+
+def bench_documents(corpus_dir, manifest, options):
+    from artifact_store import ArtifactStore
+    from document_processor.doc_processor import DocumentProcessor, shutdown_process_pools
+
+    folder = os.path.join(corpus_dir, "documents")
+    processor = DocumentProcessor(
+        certificate_folder=folder,
+        output_folder=tempfile.mkdtemp(),
+        pdf_dpi=options["pdf_dpi"]
+    )
+    store = ArtifactStore()
+    latencies, wall = timed(
+        [os.path.join(folder, filename) for filename in manifest["documents"]],
+        lambda path: processor.process_single_file(path, store)
+    )
+
+    # Same upload through the parallel path the app uses
+    parallel = DocumentProcessor(
+        certificate_folder=folder,
+        output_folder=tempfile.mkdtemp(),
+        pdf_dpi=options["pdf_dpi"],
+        render_workers=options["workers"],
+        convert_workers=options["workers"]
+    )
+    start = time.perf_counter()
+    outputs = parallel.process_documents(ArtifactStore())
+    parallel_wall = time.perf_counter() - start
+    # This stage runs in a pool worker, which would otherwise wait on the render workers at exit
+    shutdown_process_pools()
+
+    return summarize(
+        latencies, wall,
+        pages=len(store.names()),
+        parallel={"workers": options["workers"], "wall_seconds": round(parallel_wall, 4), "outputs": len(outputs)}
+    )
+
+
+def bench_detector(corpus_dir, manifest, options):
+    from certificate_detection.detector import CertificateDetector
+
+    detector = CertificateDetector(backend=options["detector_backend"])
+    if detector.model is None:
+        raise RuntimeError("Detector model could not be loaded")
+    store = load_images(os.path.join(corpus_dir, "photos"), manifest["photos"])
+    names = store.names()
+
+    # Warm the model up so the first item does not carry the load cost
+    detector.detect_and_crop_batch([store.get(names[0])], ["warmup"])
+    latencies, wall = timed(names, lambda name: detector.detect_and_crop_batch([store.get(name)], [Path(name).stem]))
+
+    start = time.perf_counter()
+    crops = detector.detect_and_crop_batch([store.get(name) for name in names], [Path(name).stem for name in names])
+    batched_wall = time.perf_counter() - start
+
+    return summarize(
+        latencies, wall,
+        backend=options["detector_backend"],
+        batched={"wall_seconds": round(batched_wall, 4), "crops": sum(len(found) for found in crops)}
+    )
+
+
+def bench_similarity(corpus_dir, manifest, options):
+    from similar_certificates.similarity import similarity_checker
+    from similar_certificates.template_registry import TemplateRegistry
+
+    registry = TemplateRegistry()
+    filenames = [entry["file"] for entry in manifest["certificates"]]
+    store = load_images(os.path.join(corpus_dir, "ecertificates"), filenames)
+
+    def run(name):
+        similarity_checker({
+            "human": [], "ecerti": [name], "accepted_certi": [], "rejected_certi": [],
+            "template_matches": {}, "artifacts": store
+        }, registry)
+
+    latencies, wall = timed(filenames, run)
+    return summarize(latencies, wall)
+
+
+def bench_ocr(corpus_dir, manifest, options):
+    from ocr_checking.ocr import OCREngine, TieredOCREngine, ocr_checker
+
+    engine = OCREngine(pool_size=1)
+    if options["ocr_mode"] == "tiered":
+        engine = TieredOCREngine(engine)
+    engine.warmup()
+    filenames = [entry["file"] for entry in manifest["certificates"]][:options["ocr_items"]]
+    store = load_images(os.path.join(corpus_dir, "ecertificates"), filenames)
+
+    latencies, wall = timed(
+        filenames,
+        lambda name: ocr_checker({"accepted_certi": [name], "ocr_texts": {}, "artifacts": store}, engine)
+    )
+    return summarize(latencies, wall)
+
+
+def bench_validation(corpus_dir, manifest, options):
+    # Read when validation is imported. Importing app instead would load YOLO, EasyOCR and Mongo
+    os.environ["LLM_BATCH_SIZE"] = str(options["llm_batch_size"])
+
+    from benchmarks.fakes import InMemoryStudents
+    from llm_provider import FakeChatModel
+    from session_events import SessionEvents
+    from session_store import MemorySessionStore
+    from validation import validate_certificates
+
+    llm = FakeChatModel(latency_seconds=options["llm_latency"])
+    students = InMemoryStudents(manifest["records"], latency_seconds=options["mongo_latency"])
+    events_store = MemorySessionStore()
+
+    def new_state(certificates):
+        return {
+            "ocr_texts": {entry["file"]: entry["ocr_text"] for entry in certificates},
+            "extracted_fields": {},
+            "comparisons": {},
+            "unverified": [],
+            "accepted_certi": [entry["file"] for entry in certificates],
+            "rejected_certi": [],
+            "sources": {},
+            "messages": [],
+            "events": SessionEvents(events_store, "benchmark")
+        }
+
+    certificates = manifest["certificates"]
+    latencies, wall = timed(
+        certificates, lambda entry: validate_certificates(new_state([entry]), llm, students.fetch_many)
+    )
+
+    # One state holding every certificate, as a real session would
+    state = new_state(certificates)
+    start = time.perf_counter()
+    validate_certificates(state, llm, students.fetch_many)
+    session_wall = time.perf_counter() - start
+
+    correct = sum(
+        1 for entry in certificates
+        if (entry["file"] in state["accepted_certi"]) == (entry["expected"] == "accepted")
+    )
+    return summarize(
+        latencies, wall,
+        llm_batch_size=options["llm_batch_size"],
+        session={"wall_seconds": round(session_wall, 4), "mongo_queries": students.queries},
+        accuracy=round(correct / len(certificates), 4)
+    )
+
+
+BENCHMARKS = {
+    "documents": bench_documents,
+    "detector": bench_detector,
+    "similarity": bench_similarity,
+    "ocr": bench_ocr,
+    "validation": bench_validation,
+}
+
+
+def run_stage(stage, corpus_dir, options):
+    """Entry point of the per-stage worker process"""
+    with open(os.path.join(corpus_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    # Keep stdout for the JSON report; the stages log with print
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            report = BENCHMARKS[stage](corpus_dir, manifest, options)
+            report["status"] = "ok"
+        except Exception as e:
+            report = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """List the stages whose p95 latency grew or throughput fell by more than tolerance"""
+    regressions = []
+    for stage, report in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or report.get("status") != "ok" or previous.get("status") != "ok":
+            continue
+        if not report.get("latency_ms") or not previous.get("latency_ms"):
+            continue
+        if report["latency_ms"]["p95"] > previous["latency_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{stage}: p95 {previous['latency_ms']['p95']} -> {report['latency_ms']['p95']} ms")
+        if report["throughput_per_second"] < previous["throughput_per_second"] * (1 - tolerance):
+            regressions.append(f"{stage}: throughput {previous['throughput_per_second']} -> {report['throughput_per_second']}/s")
+        if report["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{stage}: peak RSS {previous['peak_rss_mb']} -> {report['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on a synthetic corpus")
+    parser.add_argument("--corpus-dir", default="./benchmarks/corpus")
+    parser.add_argument("--rebuild-corpus", action="store_true", help="Regenerate the corpus even if it exists")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--certificates", type=int, default=20)
+    parser.add_argument("--photos", type=int, default=5)
+    parser.add_argument("--pdfs", type=int, default=3)
+    parser.add_argument("--pages-per-pdf", type=int, default=3)
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma separated subset of {STAGES}")
+    parser.add_argument("--pdf-dpi", type=int, default=144)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--detector-backend", default="pytorch")
+    parser.add_argument("--ocr-items", type=int, default=5, help="EasyOCR is slow on CPU; cap the certificates it reads")
+    parser.add_argument("--ocr-mode", default="easyocr", choices=["tiered", "easyocr"])
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per LLM call")
+    parser.add_argument("--mongo-latency", type=float, default=0.0, help="Simulated seconds per Mongo query")
+    parser.add_argument("--llm-batch-size", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    corpus_dir = os.path.abspath(args.corpus_dir)
+    if args.rebuild_corpus or not os.path.exists(os.path.join(corpus_dir, "manifest.json")):
+        # stdout carries only the JSON report; importing PyMuPDF can print a warning too
+        with contextlib.redirect_stdout(sys.stderr):
+            from benchmarks.corpus import build_corpus
+            build_corpus(
+                corpus_dir, seed=args.seed, certificates=args.certificates, photos=args.photos,
+                pdfs=args.pdfs, pages_per_pdf=args.pages_per_pdf
+            )
+
+    options = {
+        "pdf_dpi": args.pdf_dpi,
+        "workers": args.workers,
+        "detector_backend": args.detector_backend,
+        "ocr_items": args.ocr_items,
+        "ocr_mode": args.ocr_mode,
+        "llm_latency": args.llm_latency,
+        "mongo_latency": args.mongo_latency,
+        "llm_batch_size": args.llm_batch_size,
+    }
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "options": options,
+        "stages": {},
+    }
+
+    for stage in stages:
+        print(f"Benchmarking {stage}...", file=sys.stderr)
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results["stages"][stage] = pool.submit(run_stage, stage, corpus_dir, options).result()
+
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
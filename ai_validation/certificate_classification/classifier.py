@@ -0,0 +1,158 @@
+# certificate_classification/classifier.py
+import json
+import math
+import os
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+FEATURES = [
+    "camera_exif",      # EXIF names a camera make/model
+    "pdf_source",       # Page rendered from a PDF
+    "white_fraction",   # Share of near-white paper pixels
+    "border_variation", # Brightness spread between patches of the outer frame (desk, shadows)
+    "noise",            # Sensor noise estimate on flat areas
+    "axis_alignment",   # Share of straight-line length that is exactly horizontal/vertical
+    "illumination",     # Low-frequency lighting gradient across the image
+]
+
+# Hand-set logistic weights for P(e-certificate), not fitted on data; replace them with
+# weights from evaluate.py --fit, which reports accuracy on a held-out split
+DEFAULT_WEIGHTS = {
+    "bias": 0.5,
+    "camera_exif": -5.0,
+    "pdf_source": 4.0,
+    "white_fraction": 4.0,
+    "border_variation": -4.0,
+    "noise": -8.0,
+    "axis_alignment": 3.0,
+    "illumination": -6.0,
+}
+
+EXIF_MAKE = 271
+EXIF_MODEL = 272
+EXIF_EXTENSIONS = {'.jpg', '.jpeg', '.tiff', '.webp'}
+
+
+def estimate_noise(gray):
+    """Immerkaer's noise estimate in grey levels, measured on flat areas only so text and edges do not count"""
+    gray = gray.astype(np.float32)
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = np.abs(cv2.filter2D(gray, -1, kernel))[1:-1, 1:-1]
+    gradient = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1))[1:-1, 1:-1]
+    flat = gradient < 40
+    if not flat.any():
+        return 0.0
+    return float(response[flat].mean() * math.sqrt(math.pi / 2) / 6)
+
+
+def axis_alignment(gray):
+    """Length-weighted share of detected line segments within 1 degree of an axis"""
+    edges = cv2.Canny(gray, 50, 150)
+    lines = cv2.HoughLinesP(edges, 1, np.pi / 180, threshold=60, minLineLength=gray.shape[1] // 8, maxLineGap=5)
+    if lines is None:
+        return 0.5
+    total = 0.0
+    aligned = 0.0
+    for x1, y1, x2, y2 in lines.reshape(-1, 4):
+        length = math.hypot(x2 - x1, y2 - y1)
+        angle = abs(math.degrees(math.atan2(y2 - y1, x2 - x1))) % 90
+        total += length
+        if angle < 1 or angle > 89:
+            aligned += length
+    return aligned / total if total else 0.5
+
+
+def border_variation(gray, patches_per_side=4):
+    """
+    Spread of the mean brightness of patches around the outer frame
+
+    A rendered certificate's margin or decorative frame looks the same all the
+    way round; a photo's frame mixes desk, paper edge and shadow.
+    """
+    h, w = gray.shape
+    band = max(2, int(min(h, w) * 0.04))
+    means = []
+    for index in range(patches_per_side):
+        x0, x1 = index * w // patches_per_side, (index + 1) * w // patches_per_side
+        y0, y1 = index * h // patches_per_side, (index + 1) * h // patches_per_side
+        means.extend([
+            gray[:band, x0:x1].mean(), gray[-band:, x0:x1].mean(),
+            gray[y0:y1, :band].mean(), gray[y0:y1, -band:].mean()
+        ])
+    return float(np.std(means))
+
+
+def has_camera_exif(source_path):
+    if not source_path or Path(source_path).suffix.lower() not in EXIF_EXTENSIONS:
+        return False
+    try:
+        with Image.open(source_path) as img:
+            exif = img.getexif()
+            return bool(exif.get(EXIF_MAKE) or exif.get(EXIF_MODEL))
+    except Exception:
+        return False
+
+
+class CertificateTypeClassifier:
+    def __init__(self, weights_path=None, threshold=0.85, max_side=512):
+        """
+        Cheap CPU gate in front of the vision LLM
+
+        Scores an image from statistics that separate rendered e-certificates
+        (flat white paper, exact horizontal lines, no sensor noise) from phone
+        photos (desk background, perspective, noise, uneven lighting).
+
+        Args:
+            weights_path: JSON file of fitted weights; the built-in weights otherwise
+            threshold: Probability one label needs before the LLM is skipped
+            max_side: Images are downscaled to this size before scoring
+        """
+        self.threshold = threshold
+        self.max_side = max_side
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights_path and os.path.exists(weights_path):
+            with open(weights_path) as f:
+                self.weights.update(json.load(f))
+            print(f"Loaded certificate type weights from {weights_path}")
+
+    def features(self, image, source_path=None):
+        """Feature vector of a BGR image; source_path is the uploaded file it came from"""
+        h, w = image.shape[:2]
+        scale = self.max_side / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape
+
+        lighting = cv2.resize(gray, (16, 16), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        return {
+            "camera_exif": 1.0 if has_camera_exif(source_path) else 0.0,
+            "pdf_source": 1.0 if source_path and Path(source_path).suffix.lower() == ".pdf" else 0.0,
+            "white_fraction": float(np.mean(image.min(axis=2) > 225)),
+            "border_variation": min(border_variation(gray) / 30.0, 1.0),
+            "noise": min(estimate_noise(gray) / 4.0, 1.0),
+            "axis_alignment": axis_alignment(gray),
+            "illumination": min(float(lighting.std()) / 60.0, 1.0),
+        }
+
+    def probability(self, features):
+        """P(e-certificate) under the logistic model"""
+        score = self.weights["bias"] + sum(self.weights[name] * features[name] for name in FEATURES)
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def classify(self, image, source_path=None):
+        """
+        Returns:
+            (label, probability) where label is "ecertificate", "human" or
+            None when the image is too ambiguous to skip the LLM
+        """
+        probability = self.probability(self.features(image, source_path))
+        if probability >= self.threshold:
+            return "ecertificate", probability
+        if probability <= 1 - self.threshold:
+            return "human", probability
+        return None, probability
@@ -0,0 +1,178 @@
+# certificate_classification/evaluate.py
+"""
+Measure the local certificate type gate on labelled images
+
+    python -m certificate_classification.evaluate --ecert-dir data/ecert --human-dir data/photos
+    python -m certificate_classification.evaluate --corpus-dir benchmarks/corpus
+    python -m certificate_classification.evaluate --ecert-dir ... --human-dir ... --fit --weights-out weights.json
+
+Reports how often the gate decides on its own (the LLM calls avoided), how
+accurate those decisions are, and the time it takes per image. --fit holds
+out --test-fraction of the source files, learns logistic weights from the
+rest and reports before/after figures on the held-out files only; point
+CLASSIFIER_WEIGHTS_PATH at the written file to use them in the app.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from certificate_classification.classifier import CertificateTypeClassifier, FEATURES
+from document_processor.doc_processor import DocumentProcessor
+
+LABELS = ("ecertificate", "human")
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp'}
+
+
+def load_examples(folder, label, pdf_dpi=144):
+    """(label, BGR image, source path) for every image and PDF page in folder"""
+    processor = DocumentProcessor(certificate_folder=folder, output_folder=folder, pdf_dpi=pdf_dpi)
+    examples = []
+    for path in sorted(Path(folder).iterdir()):
+        suffix = path.suffix.lower()
+        if suffix in IMAGE_EXTENSIONS:
+            image = processor.convert_image_to_array(str(path))
+            if image is not None:
+                examples.append((label, image, str(path)))
+        elif suffix == ".pdf":
+            for _, image in processor.iter_pdf_pages(str(path)):
+                examples.append((label, image, str(path)))
+    return examples
+
+
+def split_examples(examples, test_fraction, seed=0):
+    """
+    (train, test) split by source file, stratified by label
+
+    Pages of one PDF stay on the same side so the test set never holds a
+    near copy of a training image.
+    """
+    rng = random.Random(seed)
+    train, test = [], []
+    for label in LABELS:
+        sources = sorted({source for example_label, _, source in examples if example_label == label})
+        rng.shuffle(sources)
+        test_count = round(len(sources) * test_fraction)
+        if len(sources) > 1:
+            test_count = min(max(test_count, 1), len(sources) - 1)
+        test_sources = set(sources[:test_count])
+        for example in examples:
+            if example[0] == label:
+                (test if example[2] in test_sources else train).append(example)
+    return train, test
+
+
+def fit_weights(features, labels, epochs=2000, learning_rate=0.5, l2=0.01):
+    """Plain batch gradient descent logistic regression; 1 means e-certificate"""
+    x = np.array([[row[name] for name in FEATURES] for row in features], dtype=np.float64)
+    y = np.array([1.0 if label == "ecertificate" else 0.0 for label in labels])
+    weights = np.zeros(len(FEATURES))
+    bias = 0.0
+    for _ in range(epochs):
+        predictions = 1.0 / (1.0 + np.exp(-(x @ weights + bias)))
+        error = predictions - y
+        weights -= learning_rate * (x.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * error.mean()
+    return {"bias": round(float(bias), 4), **{name: round(float(w), 4) for name, w in zip(FEATURES, weights)}}
+
+
+def evaluate(classifier, examples):
+    confusion = {actual: {"ecertificate": 0, "human": 0, "llm": 0} for actual in LABELS}
+    timings = []
+    features = []
+    for label, image, source in examples:
+        start = time.perf_counter()
+        row = classifier.features(image, source)
+        probability = classifier.probability(row)
+        timings.append(time.perf_counter() - start)
+        features.append(row)
+
+        if probability >= classifier.threshold:
+            confusion[label]["ecertificate"] += 1
+        elif probability <= 1 - classifier.threshold:
+            confusion[label]["human"] += 1
+        else:
+            confusion[label]["llm"] += 1
+
+    total = len(examples)
+    decided = sum(confusion[actual][predicted] for actual in LABELS for predicted in LABELS)
+    correct = sum(confusion[actual][actual] for actual in LABELS)
+    timings_ms = np.array(timings) * 1000
+    report = {
+        "images": total,
+        "threshold": classifier.threshold,
+        "decided_locally": decided,
+        "llm_calls_avoided_pct": round(100 * decided / total, 2) if total else 0.0,
+        "local_accuracy": round(correct / decided, 4) if decided else None,
+        # Assuming the LLM gets the deferred images right
+        "pipeline_accuracy": round((correct + sum(confusion[actual]["llm"] for actual in LABELS)) / total, 4) if total else None,
+        "confusion": confusion,
+        "latency_ms": {
+            "p50": round(float(np.percentile(timings_ms, 50)), 3),
+            "p95": round(float(np.percentile(timings_ms, 95)), 3),
+        } if total else None,
+    }
+    return report, features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the local e-certificate vs photo classifier")
+    parser.add_argument("--ecert-dir", help="Folder of e-certificates (images or PDFs)")
+    parser.add_argument("--human-dir", help="Folder of photographed certificates")
+    parser.add_argument("--corpus-dir", help="Benchmark corpus (uses its ecertificates/ and photos/ folders)")
+    parser.add_argument("--weights", default=os.getenv("CLASSIFIER_WEIGHTS_PATH"), help="Weights JSON to evaluate")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--fit", action="store_true", help="Fit weights on a training split and evaluate on the rest")
+    parser.add_argument("--test-fraction", type=float, default=0.3, help="Share of files held out for evaluation with --fit")
+    parser.add_argument("--seed", type=int, default=0, help="Shuffle seed for the train/test split")
+    parser.add_argument("--weights-out", default="./certificate_classification/weights.json")
+    args = parser.parse_args()
+
+    if args.corpus_dir:
+        ecert_dir = os.path.join(args.corpus_dir, "ecertificates")
+        human_dir = os.path.join(args.corpus_dir, "photos")
+    elif args.ecert_dir and args.human_dir:
+        ecert_dir, human_dir = args.ecert_dir, args.human_dir
+    else:
+        parser.error("Give --corpus-dir, or both --ecert-dir and --human-dir")
+
+    examples = load_examples(ecert_dir, "ecertificate") + load_examples(human_dir, "human")
+    if not examples:
+        print("No images found")
+        sys.exit(1)
+
+    classifier = CertificateTypeClassifier(weights_path=args.weights, threshold=args.threshold)
+
+    if args.fit:
+        train, test = split_examples(examples, args.test_fraction, args.seed)
+        if not train or not test:
+            print("Need at least two files per label to hold some out", file=sys.stderr)
+            sys.exit(1)
+        _, train_features = evaluate(classifier, train)
+        report, _ = evaluate(classifier, test)
+        weights = fit_weights(train_features, [label for label, _, _ in train])
+        with open(args.weights_out, "w") as f:
+            json.dump(weights, f, indent=2)
+        print(f"Fitted weights written to {args.weights_out}", file=sys.stderr)
+        classifier.weights.update(weights)
+        fitted_report, _ = evaluate(classifier, test)
+        report = {
+            "train_images": len(train),
+            "test_images": len(test),
+            "before_fit": report,
+            "after_fit": fitted_report,
+            "weights": weights,
+        }
+    else:
+        report, _ = evaluate(classifier, examples)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
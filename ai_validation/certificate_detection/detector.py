@@ -280,14 +280,23 @@ from PIL import Image
 import os
 from ultralytics import YOLO
 import time
+from certificate_detection.export_model import exported_model_path
+from metrics import DETECTION_INFERENCE_DURATION, DETECTION_IMAGES
 
 class CertificateDetector:
-    def __init__(self, model_path="./certificate_detection/yolov8/best.pt", confidence_threshold=0.25):
+    def __init__(self, model_path="./certificate_detection/yolov8/best.pt", confidence_threshold=0.25, backend="pytorch", int8=False):
         """
         Initialize the certificate detector with your trained model
+        
+        Args:
+            backend: "pytorch", "onnx" (ONNX Runtime) or "openvino"; exports are created
+                with certificate_detection/export_model.py and fall back to the .pt model
+            int8: Use the INT8 quantized export of the backend
         """
         self.confidence_threshold = confidence_threshold
         self.model_path = model_path
+        self.backend = backend
+        self.int8 = int8
         self.model = None
         
         # Load the model once at startup
@@ -296,10 +305,26 @@ class CertificateDetector:
         else:
             print(f"Model not found at {self.model_path}")
     
+    def resolve_model_path(self):
+        """Exported model for the configured backend, or the .pt model when it is missing"""
+        if self.backend == "pytorch":
+            return self.model_path
+        
+        exported_path = exported_model_path(self.model_path, self.backend, self.int8)
+        if os.path.exists(exported_path):
+            return exported_path
+        
+        print(f"No {self.backend} export found at {exported_path}, falling back to {self.model_path}")
+        return self.model_path
+    
     def load_model(self):
         """Load your trained YOLO model with maximum speed optimizations"""
+        model_path = self.resolve_model_path()
         try:
-            self.model = YOLO(self.model_path)
+            if model_path != self.model_path:
+                self.model = YOLO(model_path, task="detect")
+            else:
+                self.model = YOLO(model_path)
             
             # Maximum speed optimizations
             self.model.overrides.update({
@@ -319,10 +344,15 @@ class CertificateDetector:
             dummy_img = np.zeros((320, 320, 3), dtype=np.uint8)
             self.model(dummy_img, verbose=False)
             
-            print(f"Certificate detection model loaded and warmed up from {self.model_path}")
+            print(f"Certificate detection model loaded and warmed up from {model_path}")
             return True
         except Exception as e:
             print(f"Error loading model: {e}")
+            if model_path != self.model_path:
+                # Keep serving with the original PyTorch model
+                print(f"Falling back to {self.model_path}")
+                self.backend = "pytorch"
+                return self.load_model()
             return False
     
     def preprocess_image_for_detection(self, image_path, max_size=(320, 320)):
@@ -332,135 +362,162 @@ class CertificateDetector:
             image = cv2.imread(image_path, cv2.IMREAD_COLOR)
             if image is None:
                 return None, None
-                
-            original_shape = image.shape[:2]
-            
-            # Aggressive resizing for maximum speed
-            h, w = original_shape
-            if h > max_size[0] or w > max_size[1]:
-                # Quick resize with nearest neighbor (fastest)
-                scale = min(max_size[0]/h, max_size[1]/w)
-                new_h, new_w = int(h * scale), int(w * scale)
-                image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_NEAREST)
-            
-            return image, original_shape
+            return self.preprocess_array_for_detection(image, max_size)
         except Exception as e:
             print(f"Error preprocessing image: {e}")
             return None, None
     
+    def preprocess_array_for_detection(self, image, max_size=(320, 320)):
+        """Downscale an already decoded BGR image for detection"""
+        original_shape = image.shape[:2]
+        
+        # Aggressive resizing for maximum speed
+        h, w = original_shape
+        if h > max_size[0] or w > max_size[1]:
+            # Quick resize with nearest neighbor (fastest)
+            scale = min(max_size[0]/h, max_size[1]/w)
+            new_h, new_w = int(h * scale), int(w * scale)
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_NEAREST)
+        
+        return image, original_shape
+    
     def detect_and_crop_certificates(self, image_path, output_folder="./processed_certificates", padding=10, timeout=10):
         """
         Ultra-fast detection and cropping with aggressive optimizations
         """
-        if self.model is None:
-            print("Model not loaded. Cannot perform detection.")
+        original_image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if original_image is None:
             return []
         
-        start_time = time.time()
+        base_filename = os.path.splitext(os.path.basename(image_path))[0]
+        crops = self.detect_and_crop_image(original_image, base_filename, padding, timeout)
         
-        try:
-            print(f"Starting ultra-fast detection for: {os.path.basename(image_path)}")
-            
-            # Lightning-fast preprocessing
-            processed_image, original_shape = self.preprocess_image_for_detection(image_path)
-            if processed_image is None:
-                return []
-            
-            # Ultra-fast inference with minimal settings
-            inference_start = time.time()
-            
-            results = self.model(
-                processed_image, 
-                conf=self.confidence_threshold,
-                iou=0.7,
-                max_det=2,  # Limit to 2 detections max for speed
-                imgsz=320,  # Smallest viable size
-                verbose=False,
-                stream=False,
-                augment=False,  # Disable test-time augmentation
-                classes=None,
-                retina_masks=False
-            )
-            
-            inference_time = time.time() - inference_start
-            print(f"Ultra-fast inference completed in {inference_time:.3f} seconds")
-            
-            # Quick timeout check
-            if time.time() - start_time > timeout:
-                print(f"Detection timeout exceeded ({timeout}s)")
-                return []
-            
-            # Load original image only if detections found
-            detection_found = False
-            for result in results:
-                if result.boxes is not None and len(result.boxes) > 0:
-                    detection_found = True
-                    break
-            
-            if not detection_found:
-                print("No detections found, skipping cropping")
-                return []
-            
-            # Load original image for cropping
-            original_image = cv2.imread(image_path, cv2.IMREAD_COLOR)
-            if original_image is None:
-                return []
-            
-            os.makedirs(output_folder, exist_ok=True)
+        os.makedirs(output_folder, exist_ok=True)
+        cropped_paths = []
+        for output_filename, cropped_cert in crops:
+            output_path = os.path.join(output_folder, output_filename)
             
-            cropped_paths = []
-            base_filename = os.path.splitext(os.path.basename(image_path))[0]
+            # Fastest PNG write
+            cv2.imwrite(output_path, cropped_cert, [cv2.IMWRITE_PNG_COMPRESSION, 0])
+            cropped_paths.append(output_filename)
             
-            detection_count = 0
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None and len(boxes) > 0:
-                    print(f"Found {len(boxes)} detections")
-                    
-                    for i, box in enumerate(boxes):
-                        if time.time() - start_time > timeout:
-                            break
-                            
-                        # Lightning-fast coordinate extraction
-                        coords = box.xyxy[0].cpu().numpy().astype(int)
-                        x1, y1, x2, y2 = coords
-                        confidence = float(box.conf[0].cpu().numpy())
-                        
-                        print(f"Detection {i+1}: confidence={confidence:.2f}")
-                        
-                        # Quick coordinate scaling
-                        if processed_image.shape[:2] != original_shape:
-                            scale_y = original_shape[0] / processed_image.shape[0]
-                            scale_x = original_shape[1] / processed_image.shape[1]
-                            x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
-                            y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
-                        
-                        # Fast boundary checking and padding
-                        h, w = original_image.shape[:2]
-                        x1 = max(0, x1 - padding)
-                        y1 = max(0, y1 - padding)
-                        x2 = min(w, x2 + padding)
-                        y2 = min(h, y2 + padding)
-                        
-                        # Ultra-fast cropping
-                        cropped_cert = original_image[y1:y2, x1:x2]
-                        
-                        # Fast saving with minimal compression
-                        output_filename = f"{base_filename}_detected_{detection_count+1}.png"
-                        output_path = os.path.join(output_folder, output_filename)
-                        
-                        # Fastest PNG write
-                        cv2.imwrite(output_path, cropped_cert, [cv2.IMWRITE_PNG_COMPRESSION, 0])
-                        cropped_paths.append(output_filename)
-                        detection_count += 1
-                        
-                        print(f"Cropped certificate saved: {output_filename}")
-            
-            total_time = time.time() - start_time
-            print(f"Ultra-fast detection completed in {total_time:.3f} seconds, found {len(cropped_paths)} certificates")
+            print(f"Cropped certificate saved: {output_filename}")
+        
+        return cropped_paths
+    
+    def detect_and_crop_image(self, original_image, base_filename, padding=10, timeout=10):
+        """
+        Detect and crop certificates in an already decoded BGR image, entirely in memory
+        
+        Returns:
+            List of (output filename, cropped BGR array)
+        """
+        return self.detect_and_crop_batch([original_image], [base_filename], padding, timeout)[0]
+    
+    def detect_and_crop_batch(self, images, base_filenames, padding=10, timeout=10, batch_size=16):
+        """
+        Detect and crop certificates in many decoded BGR images with batched inference
+        
+        Images are downscaled, letterboxed by ultralytics into one tensor per
+        batch of batch_size and run through a single forward pass; boxes are
+        then mapped back to each original image.
+        
+        Returns:
+            One list of (output filename, cropped BGR array) per input image
+        """
+        all_crops = [[] for _ in images]
+        if self.model is None:
+            print("Model not loaded. Cannot perform detection.")
+            return all_crops
+        
+        start_time = time.time()
+        
+        for batch_start in range(0, len(images), batch_size):
+            batch_images = images[batch_start:batch_start + batch_size]
             
-            return cropped_paths
+            try:
+                print(f"Starting ultra-fast detection for {len(batch_images)} image(s)")
+                
+                # Lightning-fast preprocessing
+                preprocessed = [self.preprocess_array_for_detection(image) for image in batch_images]
+                
+                # Ultra-fast inference with minimal settings, one forward pass for the whole batch
+                inference_start = time.time()
+                
+                results = self.model(
+                    [processed_image for processed_image, _ in preprocessed], 
+                    conf=self.confidence_threshold,
+                    iou=0.7,
+                    max_det=2,  # Limit to 2 detections max for speed
+                    imgsz=320,  # Smallest viable size
+                    verbose=False,
+                    stream=False,
+                    augment=False,  # Disable test-time augmentation
+                    classes=None,
+                    retina_masks=False
+                )
+                
+                inference_time = time.time() - inference_start
+                DETECTION_INFERENCE_DURATION.observe(inference_time, backend=self.backend)
+                DETECTION_IMAGES.inc(len(batch_images), backend=self.backend)
+                print(f"Ultra-fast inference completed in {inference_time:.3f} seconds for {len(batch_images)} image(s)")
+                
+                # Quick timeout check
+                if time.time() - start_time > timeout:
+                    print(f"Detection timeout exceeded ({timeout}s)")
+                    break
+                
+                for offset, result in enumerate(results):
+                    index = batch_start + offset
+                    processed_image, original_shape = preprocessed[offset]
+                    all_crops[index] = self._crop_detections(
+                        result, images[index], processed_image.shape[:2], base_filenames[index], padding
+                    )
+            
+            except Exception as e:
+                print(f"Error during ultra-fast detection: {e}")
         
-        except Exception as e:
-            print(f"Error during ultra-fast detection: {e}")
-            return []
\ No newline at end of file
+        total_time = time.time() - start_time
+        print(f"Ultra-fast detection completed in {total_time:.3f} seconds, found {sum(len(crops) for crops in all_crops)} certificates")
+        
+        return all_crops
+    
+    def _crop_detections(self, result, original_image, processed_shape, base_filename, padding):
+        """Map the boxes of one result back to the original image and crop them"""
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            print(f"No detections found in {base_filename}, skipping cropping")
+            return []
+        
+        print(f"Found {len(boxes)} detections in {base_filename}")
+        original_shape = original_image.shape[:2]
+        
+        crops = []
+        for i, box in enumerate(boxes):
+            # Lightning-fast coordinate extraction
+            coords = box.xyxy[0].cpu().numpy().astype(int)
+            x1, y1, x2, y2 = coords
+            confidence = float(box.conf[0].cpu().numpy())
+            
+            print(f"Detection {i+1}: confidence={confidence:.2f}")
+            
+            # Quick coordinate scaling
+            if processed_shape != original_shape:
+                scale_y = original_shape[0] / processed_shape[0]
+                scale_x = original_shape[1] / processed_shape[1]
+                x1, x2 = int(x1 * scale_x), int(x2 * scale_x)
+                y1, y2 = int(y1 * scale_y), int(y2 * scale_y)
+            
+            # Fast boundary checking and padding
+            h, w = original_shape
+            x1 = max(0, x1 - padding)
+            y1 = max(0, y1 - padding)
+            x2 = min(w, x2 + padding)
+            y2 = min(h, y2 + padding)
+            
+            # Ultra-fast cropping; copy so the crop does not pin the full photo in memory
+            cropped_cert = original_image[y1:y2, x1:x2].copy()
+            output_filename = f"{base_filename}_detected_{len(crops)+1}.png"
+            crops.append((output_filename, cropped_cert))
+        
+        return crops
\ No newline at end of file
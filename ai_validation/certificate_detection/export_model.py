@@ -0,0 +1,204 @@
+# certificate_detection/export_model.py
+import argparse
+import os
+import sys
+from pathlib import Path
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+IMAGE_SIZE = 320
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp'}
+
+
+def exported_model_path(model_path, backend, int8=False):
+    """
+    Where the export of a .pt model lives for a backend
+
+    pytorch  -> best.pt (unchanged)
+    onnx     -> best.onnx, or best_int8.onnx when quantized
+    openvino -> best_openvino_model/, or best_int8_openvino_model/ when quantized
+    """
+    model_path = Path(model_path)
+    suffix = "_int8" if int8 else ""
+    if backend == "onnx":
+        return str(model_path.with_name(f"{model_path.stem}{suffix}.onnx"))
+    if backend == "openvino":
+        return str(model_path.with_name(f"{model_path.stem}{suffix}_openvino_model"))
+    return str(model_path)
+
+
+def list_images(image_dir):
+    return sorted(
+        str(path) for path in Path(image_dir).iterdir()
+        if path.suffix.lower() in IMAGE_EXTENSIONS
+    )
+
+
+def letterbox(image, size=IMAGE_SIZE):
+    """Resize keeping aspect ratio and pad to size x size, the way ultralytics feeds the model"""
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    new_h, new_w = int(round(h * scale)), int(round(w * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def export_onnx(model_path):
+    """Export the PyTorch model to ONNX with a dynamic batch axis"""
+    output = YOLO(model_path).export(format="onnx", imgsz=IMAGE_SIZE, dynamic=True, simplify=True)
+    print(f"ONNX model exported to {output}")
+    return output
+
+
+def quantize_onnx_int8(onnx_path, calibration_dir, output_path, max_images=200):
+    """Static INT8 quantization of an ONNX model using real certificate photos for calibration"""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    import onnxruntime
+
+    input_name = onnxruntime.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    images = list_images(calibration_dir)[:max_images]
+    if not images:
+        raise FileNotFoundError(f"No calibration images found in {calibration_dir}")
+
+    class CertificateCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(images)
+
+        def get_next(self):
+            path = next(self.paths, None)
+            if path is None:
+                return None
+            image = letterbox(cv2.imread(path, cv2.IMREAD_COLOR))
+            tensor = image[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255.0
+            return {input_name: np.ascontiguousarray(tensor)}
+
+    quantize_static(
+        onnx_path,
+        output_path,
+        CertificateCalibrationReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True
+    )
+    print(f"INT8 ONNX model written to {output_path} (calibrated on {len(images)} images)")
+    return output_path
+
+
+def export_openvino(model_path, int8=False, data=None):
+    """Export to OpenVINO IR; INT8 uses ultralytics/NNCF post-training quantization on the dataset yaml"""
+    kwargs = {"format": "openvino", "imgsz": IMAGE_SIZE, "dynamic": True}
+    if int8:
+        if not data:
+            raise ValueError("OpenVINO INT8 export needs --data pointing to a dataset yaml for calibration")
+        kwargs.update({"int8": True, "data": data})
+    output = YOLO(model_path).export(**kwargs)
+    print(f"OpenVINO model exported to {output}")
+    return output
+
+
+def box_iou(box_a, box_b):
+    x1, y1 = max(box_a[0], box_b[0]), max(box_a[1], box_b[1])
+    x2, y2 = min(box_a[2], box_b[2]), min(box_a[3], box_b[3])
+    intersection = max(0, x2 - x1) * max(0, y2 - y1)
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def predict_boxes(model, image):
+    result = model(image, conf=0.25, iou=0.7, max_det=2, imgsz=IMAGE_SIZE, verbose=False)[0]
+    if result.boxes is None or len(result.boxes) == 0:
+        return []
+    return [
+        (box.xyxy[0].cpu().numpy().tolist(), float(box.conf[0].cpu().numpy()))
+        for box in result.boxes
+    ]
+
+
+def check_parity(reference_path, candidate_path, image_dir, min_iou=0.9):
+    """
+    Compare detections of an exported model with the original .pt model
+
+    Every reference box must be matched by a candidate box with IoU >= min_iou
+    and the number of detections must agree.
+
+    Returns:
+        Dict with the parity report; report["passed"] tells whether the export is usable
+    """
+    reference = YOLO(reference_path)
+    candidate = YOLO(candidate_path, task="detect")
+    images = list_images(image_dir)
+
+    count_mismatches = 0
+    unmatched = 0
+    ious = []
+    confidence_deltas = []
+
+    for path in images:
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        reference_boxes = predict_boxes(reference, image)
+        candidate_boxes = predict_boxes(candidate, image)
+        if len(reference_boxes) != len(candidate_boxes):
+            count_mismatches += 1
+
+        for box, confidence in reference_boxes:
+            matches = [(box_iou(box, other), other_confidence) for other, other_confidence in candidate_boxes]
+            best_iou, best_confidence = max(matches, default=(0.0, 0.0))
+            ious.append(best_iou)
+            if best_iou < min_iou:
+                unmatched += 1
+            else:
+                confidence_deltas.append(abs(confidence - best_confidence))
+
+    report = {
+        "images": len(images),
+        "count_mismatches": count_mismatches,
+        "unmatched_boxes": unmatched,
+        "mean_iou": float(np.mean(ious)) if ious else 1.0,
+        "max_confidence_delta": float(max(confidence_deltas)) if confidence_deltas else 0.0,
+    }
+    report["passed"] = count_mismatches == 0 and unmatched == 0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the certificate detector to a faster inference backend")
+    parser.add_argument("--model", default="./certificate_detection/yolov8/best.pt")
+    parser.add_argument("--backend", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--int8", action="store_true", help="Apply static INT8 quantization")
+    parser.add_argument("--calibration-dir", help="Folder of certificate photos used for ONNX INT8 calibration and parity checks")
+    parser.add_argument("--data", help="Dataset yaml used by OpenVINO INT8 calibration")
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    args = parser.parse_args()
+
+    if args.backend == "onnx":
+        output = export_onnx(args.model)
+        if args.int8:
+            if not args.calibration_dir:
+                parser.error("--int8 with the onnx backend needs --calibration-dir")
+            output = quantize_onnx_int8(output, args.calibration_dir, exported_model_path(args.model, "onnx", int8=True))
+    else:
+        output = export_openvino(args.model, int8=args.int8, data=args.data)
+        expected = exported_model_path(args.model, "openvino", int8=args.int8)
+        if os.path.abspath(output) != os.path.abspath(expected):
+            os.replace(output, expected)
+            output = expected
+
+    if args.calibration_dir:
+        report = check_parity(args.model, output, args.calibration_dir, args.min_iou)
+        print(f"Parity report: {report}")
+        if not report["passed"]:
+            print("Exported model does not match the original; keep DETECTOR_BACKEND=pytorch")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 from pymongo import MongoClient
 from dotenv import load_dotenv
 import certifi
+from metrics import MONGO_QUERY_DURATION, RECORD_CACHE_REQUESTS
 
 load_dotenv()
 
@@ -10,13 +14,89 @@ mongo_uri = os.getenv("MONGO_URI")
 client = MongoClient(
     mongo_uri,
     tls=True,
-    tlsCAFile=certifi.where()
+    tlsCAFile=certifi.where(),
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "20")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "2")),
+    maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_MS", "300000"))
 )
 
 db = client["test"]
+
+# Only the fields the comparison needs; STUDENT_FIELDS="enrollmentNo,name,..." narrows it further
+STUDENT_FIELDS = [field.strip() for field in os.getenv("STUDENT_FIELDS", "").split(",") if field.strip()]
+if STUDENT_FIELDS:
+    projection = {field: 1 for field in STUDENT_FIELDS + ["enrollmentNo"]}
+else:
+    projection = {"__v": 0, "createdAt": 0, "updatedAt": 0}
+
+
+class TTLCache:
+    def __init__(self, max_size=1024, ttl_seconds=300):
+        """Bounded, thread-safe LRU cache whose entries expire after ttl_seconds"""
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+record_cache = TTLCache(
+    max_size=int(os.getenv("RECORD_CACHE_SIZE", "1024")),
+    ttl_seconds=int(os.getenv("RECORD_CACHE_TTL_SECONDS", "300"))
+)
+
 def fetch_data(enrollmentNo):
-    collection = db["students"]   
-    record = collection.find_one({"enrollmentNo": enrollmentNo})
+    record = record_cache.get(enrollmentNo)
+    if record is not None:
+        RECORD_CACHE_REQUESTS.inc(result="hit")
+        return record
+    RECORD_CACHE_REQUESTS.inc(result="miss")
+
+    collection = db["students"]
+    with MONGO_QUERY_DURATION.time(operation="find_one"):
+        record = collection.find_one({"enrollmentNo": enrollmentNo}, projection)
+    if record is not None:
+        record_cache.set(enrollmentNo, record)
     return record
 
+def fetch_many(enrollment_nos):
+    """Resolve many enrollment numbers with a single $in query; returns {enrollmentNo: record}"""
+    records = {}
+    missing = []
+    for enrollmentNo in dict.fromkeys(enrollment_nos):
+        record = record_cache.get(enrollmentNo)
+        if record is not None:
+            records[enrollmentNo] = record
+        else:
+            missing.append(enrollmentNo)
+    RECORD_CACHE_REQUESTS.inc(len(records), result="hit")
+    RECORD_CACHE_REQUESTS.inc(len(missing), result="miss")
+
+    if missing:
+        collection = db["students"]
+        with MONGO_QUERY_DURATION.time(operation="find_many"):
+            found = list(collection.find({"enrollmentNo": {"$in": missing}}, projection))
+        for record in found:
+            enrollmentNo = str(record["enrollmentNo"])
+            records[enrollmentNo] = record
+            record_cache.set(enrollmentNo, record)
 
+    return records
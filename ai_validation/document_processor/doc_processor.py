@@ -3,11 +3,95 @@ import fitz  # PyMuPDF for PDF processing
 from PIL import Image
 from pathlib import Path
 import shutil
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+import numpy as np
+from artifact_store import pil_to_bgr
+
+def render_pdf_page(pdf_path, page_number, dpi=144):
+    """Render one PDF page to a BGR array; module level so process pool workers can run it"""
+    pdf_document = fitz.open(pdf_path)
+    try:
+        page = pdf_document[page_number]
+        zoom = dpi / 72  # PDF user space is 72 points per inch
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        if pix.n == 1:
+            image = np.repeat(image, 3, axis=2)
+        return image[:, :, ::-1].copy()
+    finally:
+        pdf_document.close()
+
+def convert_document(file_path, output_folder, output_stem, pdf_dpi=144, in_memory=False):
+    """
+    Convert one document in a pool worker
+
+    Returns the (output filename, BGR array) pairs of its pages when in_memory,
+    otherwise the paths of the PNGs written to output_folder.
+    """
+    processor = DocumentProcessor(os.path.dirname(file_path), output_folder, pdf_dpi=pdf_dpi)
+    if in_memory:
+        return list(processor.iter_file_images(file_path, output_stem))
+    return list(processor.iter_single_file(file_path, output_stem=output_stem))
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+def get_process_pool(max_workers):
+    """
+    Process pools shared by every DocumentProcessor; spawn keeps workers clear of the API's threads
+
+    Spawned workers re-import the parent's __main__ module when it is a script.
+    The service must therefore run as `uvicorn app:app` (`python app.py` re-execs
+    into exactly that), and the task functions live in this module, which never
+    imports app.
+    """
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _process_pools[max_workers] = pool
+    return pool
+
+def shutdown_process_pools():
+    """Stop every pool; needed when the processor itself runs inside a worker process"""
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True)
+
+def reset_process_pool(max_workers):
+    """Drop a pool whose worker died so the next document gets a fresh one"""
+    with _process_pools_lock:
+        pool = _process_pools.pop(max_workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
 
 class DocumentProcessor:
-    def __init__(self, certificate_folder="./certificates", output_folder="./processed_certificates"):
+    def __init__(self, certificate_folder="./certificates", output_folder="./processed_certificates", pdf_dpi=144, render_workers=0, convert_workers=0):
+        """
+        Args:
+            pdf_dpi: Resolution PDF pages are rendered at (144 matches the old 2x zoom)
+            render_workers: Render the pages of multi-page PDFs in parallel, one page per
+                pool task; 0 renders in this process
+            convert_workers: Convert several documents in parallel, one file (or PDF page)
+                per pool task; 0 converts them one after another
+
+        Both kinds of task share one process pool of max(render_workers, convert_workers).
+        """
         self.certificate_folder = certificate_folder
         self.output_folder = output_folder
+        self.pdf_dpi = pdf_dpi
+        self.render_workers = render_workers
+        self.convert_workers = convert_workers
+        self.pool_workers = max(render_workers, convert_workers)
         self.supported_image_formats = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.gif', '.webp'}
         self.supported_pdf_formats = {'.pdf'}
         
@@ -21,7 +105,7 @@ class DocumentProcessor:
             raise FileNotFoundError(f"Certificate folder '{self.certificate_folder}' not found")
         
         files = []
-        for file in os.listdir(self.certificate_folder):
+        for file in sorted(os.listdir(self.certificate_folder)):
             # Skip system files like .DS_Store, .gitkeep, etc.
             if file.startswith('.'):
                 continue
@@ -35,24 +119,78 @@ class DocumentProcessor:
         
         return files
     
+    def output_stems(self, files):
+        """
+        Map every file to the stem of its outputs
+
+        Files sharing a stem (scan.jpg and scan.pdf) get their extension appended
+        (scan_jpg, scan_pdf) so no output overwrites another, whatever order they finish in.
+        """
+        stems = [Path(file_path).stem for file_path in files]
+        return {
+            file_path: stem if stems.count(stem) == 1 else f"{stem}_{Path(file_path).suffix.lstrip('.').lower()}"
+            for file_path, stem in zip(files, stems)
+        }
+    
+    def page_output_filename(self, stem, page_number, page_count):
+        """Single-page PDFs keep the plain name; every page of a bundle gets its own"""
+        if page_count == 1:
+            return f"{stem}.png"
+        return f"{stem}_page_{page_number + 1}.png"
+    
+    def iter_pdf_pages(self, pdf_path, output_stem=None):
+        """
+        Render every page of a PDF, yielding (output filename, BGR array) in page order
+        
+        Pages of multi-page PDFs are rendered on the process pool; each page is
+        yielded as soon as it and the pages before it are done.
+        """
+        with fitz.open(pdf_path) as pdf_document:
+            page_count = len(pdf_document)
+        if page_count == 0:
+            raise Exception("PDF has no pages")
+        
+        stem = output_stem or Path(pdf_path).stem
+        if self.render_workers > 0 and page_count > 1:
+            pool = get_process_pool(self.pool_workers)
+            futures = [pool.submit(render_pdf_page, pdf_path, page_number, self.pdf_dpi) for page_number in range(page_count)]
+            try:
+                for page_number, future in enumerate(futures):
+                    yield self.page_output_filename(stem, page_number, page_count), future.result()
+            except BrokenProcessPool:
+                reset_process_pool(self.pool_workers)
+                raise
+            finally:
+                for future in futures:
+                    future.cancel()
+        else:
+            for page_number in range(page_count):
+                yield self.page_output_filename(stem, page_number, page_count), render_pdf_page(pdf_path, page_number, self.pdf_dpi)
+    
     def convert_pdf_to_png(self, pdf_path, output_path):
-        """Convert PDF to PNG using PyMuPDF"""
+        """Convert every PDF page to PNG using PyMuPDF and return the written paths"""
         try:
-            pdf_document = fitz.open(pdf_path)
-            if len(pdf_document) == 0:
-                raise Exception("PDF has no pages")
-            
-            page = pdf_document[0]  # Get first page
-            mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-            pix = page.get_pixmap(matrix=mat)
-            pix.save(output_path)
-            pdf_document.close()
+            output_paths = []
+            output_folder = os.path.dirname(output_path)
+            for output_filename, image in self.iter_pdf_pages(pdf_path, Path(output_path).stem):
+                page_path = os.path.join(output_folder, output_filename)
+                cv2.imwrite(page_path, image)
+                output_paths.append(page_path)
             
-            return output_path
+            return output_paths
         except Exception as e:
             print(f"Error converting PDF to PNG: {e}")
             return None
     
+    def convert_image_to_array(self, image_path):
+        """Decode any image format to a BGR array in memory"""
+        try:
+            with Image.open(image_path) as img:
+                return pil_to_bgr(img)
+        except Exception as e:
+            print(f"Error converting image to array: {e}")
+            return None
+    
     def convert_image_to_png(self, image_path, output_path):
         """Convert any image format to PNG"""
         try:
@@ -72,64 +210,208 @@ class DocumentProcessor:
             print(f"Error converting image to PNG: {e}")
             return None
     
-    def process_single_file(self, file_path):
-        """Process a single file and convert to PNG"""
-        try:
-            file_name = os.path.basename(file_path)
-            file_ext = Path(file_path).suffix.lower()
-            
-            print(f"Processing: {file_name}")
-            
-            # Generate output filename
-            output_filename = f"{Path(file_name).stem}.png"
-            output_path = os.path.join(self.output_folder, output_filename)
-            
-            # Process based on file type
-            if file_ext in self.supported_image_formats:
-                if file_ext == '.png':
-                    shutil.copy2(file_path, output_path)
-                    result = output_path
-                else:
-                    result = self.convert_image_to_png(file_path, output_path)
-                    
-            elif file_ext in self.supported_pdf_formats:
-                result = self.convert_pdf_to_png(file_path, output_path)
-            else:
-                print(f"Skipping unsupported file format: {file_name}")
-                return None
-            
-            if result and os.path.exists(result) and os.path.getsize(result) > 0:
+    def iter_file_images(self, file_path, output_stem=None):
+        """Decode a single file to BGR arrays, yielding (output filename, array) per image or PDF page"""
+        file_ext = Path(file_path).suffix.lower()
+        output_filename = f"{output_stem or Path(file_path).stem}.png"
+        
+        if file_ext in self.supported_image_formats:
+            image = self.convert_image_to_array(file_path)
+            if image is not None and image.size > 0:
+                yield output_filename, image
+        elif file_ext in self.supported_pdf_formats:
+            yield from self.iter_pdf_pages(file_path, output_stem)
+        else:
+            print(f"Skipping unsupported file format: {os.path.basename(file_path)}")
+    
+    def iter_single_file(self, file_path, store=None, output_stem=None):
+        """
+        Convert a single file to PNG, or decode it into the artifact store when one
+        is given, yielding each output (path, or name in the store) as soon as it is ready
+        """
+        file_name = os.path.basename(file_path)
+        file_ext = Path(file_path).suffix.lower()
+        
+        print(f"Processing: {file_name}")
+        
+        if store is not None:
+            for output_filename, image in self.iter_file_images(file_path, output_stem):
+                store.put(output_filename, image)
                 print(f"Successfully processed: {output_filename}")
-                return result
+                yield output_filename
+            return
+        
+        # Generate output filename
+        output_filename = f"{output_stem or Path(file_name).stem}.png"
+        output_path = os.path.join(self.output_folder, output_filename)
+        
+        # Process based on file type
+        if file_ext in self.supported_image_formats:
+            if file_ext == '.png':
+                shutil.copy2(file_path, output_path)
+                results = [output_path]
             else:
-                return None
+                results = [self.convert_image_to_png(file_path, output_path)]
                 
+        elif file_ext in self.supported_pdf_formats:
+            results = self.convert_pdf_to_png(file_path, output_path) or []
+        else:
+            print(f"Skipping unsupported file format: {file_name}")
+            return
+        
+        for result in results:
+            if result and os.path.exists(result) and os.path.getsize(result) > 0:
+                print(f"Successfully processed: {os.path.basename(result)}")
+                yield result
+    
+    def process_single_file(self, file_path, store=None):
+        """Process a single file and return all of its outputs (one per PDF page)"""
+        try:
+            return list(self.iter_single_file(file_path, store))
         except Exception as e:
-            print(f"Error processing {file_name}: {e}")
-            return None
+            print(f"Error processing {os.path.basename(file_path)}: {e}")
+            return []
     
-    def process_documents(self):
-        """Main function to process all documents and convert to PNG"""
+    def iter_documents(self, store=None):
+        """Yield (source file path, output) for every page of every document as it is converted"""
         try:
             all_files = self.get_all_files()
-            processed_files = []
-            
-            print(f"Found {len(all_files)} file(s) to process")
-            
-            for file_path in all_files:
-                result = self.process_single_file(file_path)
-                if result:
-                    processed_files.append(result)
+        except Exception as e:
+            print(f"Error processing documents: {e}")
+            return
+        
+        print(f"Found {len(all_files)} file(s) to process")
+        output_stems = self.output_stems(all_files)
+        
+        if self.convert_workers > 0 and len(all_files) > 1:
+            yield from self.iter_documents_parallel(all_files, output_stems, store)
+            return
+        
+        for file_path in all_files:
+            try:
+                for result in self.iter_single_file(file_path, store, output_stems[file_path]):
+                    yield file_path, result
+            except Exception as e:
+                print(f"Error processing {os.path.basename(file_path)}: {e}")
+    
+    def submit_document(self, pool, file_path, output_stem, in_memory):
+        """
+        Queue one file on the shared pool
+
+        Multi-page PDFs get one task per page (when render_workers is set), so a
+        large bundle in a multi-file upload still renders in parallel; anything
+        else is one convert_document task.
+
+        Returns:
+            List of (page output filename, page number, future); filename and page
+            number are None for a whole-file task
+        """
+        if self.render_workers > 0 and Path(file_path).suffix.lower() in self.supported_pdf_formats:
+            with fitz.open(file_path) as pdf_document:
+                page_count = len(pdf_document)
+            if page_count > 1:
+                return [
+                    (self.page_output_filename(output_stem, page_number, page_count), page_number,
+                     pool.submit(render_pdf_page, file_path, page_number, self.pdf_dpi))
+                    for page_number in range(page_count)
+                ]
+        return [(None, None, pool.submit(convert_document, file_path, self.output_folder, output_stem, self.pdf_dpi, in_memory))]
+    
+    def collect_page(self, output_filename, image, store=None):
+        """Keep a page rendered by the pool: into the store, or as a PNG in the output folder"""
+        if store is not None:
+            store.put(output_filename, image)
+            return output_filename
+        output_path = os.path.join(self.output_folder, output_filename)
+        cv2.imwrite(output_path, image)
+        return output_path
+    
+    def iter_documents_parallel(self, all_files, output_stems, store=None):
+        """
+        Convert every file (and every page of multi-page PDFs) on the shared pool,
+        yielding results in file and page order as they complete
+
+        A file that fails is reported and skipped; the others still convert. If a
+        worker dies, whatever is left is converted in this process.
+        """
+        pool = get_process_pool(self.pool_workers)
+        tasks = []
+        for file_path in all_files:
+            try:
+                tasks.append(self.submit_document(pool, file_path, output_stems[file_path], store is not None))
+            except Exception as e:
+                print(f"Error processing {os.path.basename(file_path)}: {e}")
+                tasks.append([])
+        
+        try:
+            for index, (file_path, file_tasks) in enumerate(zip(all_files, tasks)):
+                done = 0
+                try:
+                    for output_filename, _, future in file_tasks:
+                        if output_filename is not None:
+                            outputs = [self.collect_page(output_filename, future.result(), store)]
+                        elif store is not None:
+                            outputs = [self.collect_page(name, image, store) for name, image in future.result()]
+                        else:
+                            outputs = future.result()
+                        for output in outputs:
+                            yield file_path, output
+                        done += 1
+                except BrokenProcessPool as e:
+                    print(f"Error processing {os.path.basename(file_path)}: {e}")
+                    reset_process_pool(self.pool_workers)
+                    yield from self.iter_remaining_in_process(all_files[index:], file_tasks[done:], output_stems, store)
+                    return
+                except Exception as e:
+                    print(f"Error processing {os.path.basename(file_path)}: {e}")
+                    continue
+                
+                if file_tasks:
+                    print(f"Processed: {os.path.basename(file_path)}")
+        finally:
+            for file_tasks in tasks:
+                for _, _, future in file_tasks:
+                    future.cancel()
+    
+    def iter_remaining_in_process(self, remaining_files, unfinished_pages, output_stems, store=None):
+        """Finish a parallel conversion in this process after the pool broke"""
+        current, later = remaining_files[0], remaining_files[1:]
+        if unfinished_pages and unfinished_pages[0][1] is None:
+            # The whole-file task of the current file never finished
+            later = remaining_files
+        else:
+            try:
+                # Pages of the current PDF that were not yielded yet
+                for output_filename, page_number, _ in unfinished_pages:
+                    image = render_pdf_page(current, page_number, self.pdf_dpi)
+                    yield current, self.collect_page(output_filename, image, store)
+            except Exception as e:
+                print(f"Error processing {os.path.basename(current)}: {e}")
+        
+        for file_path in later:
+            try:
+                for result in self.iter_single_file(file_path, store, output_stems[file_path]):
+                    yield file_path, result
+            except Exception as e:
+                print(f"Error processing {os.path.basename(file_path)}: {e}")
+    
+    def process_documents(self, store=None):
+        """
+        Main function to process all documents and convert to PNG (or into an ArtifactStore)
+
+        Returns:
+            Every processed output (paths, or names in the store) in file and page order
+        """
+        try:
+            processed_files = [result for _, result in self.iter_documents(store)]
             
             if not processed_files:
                 print("No files were successfully processed")
-                return None
+                return []
             
             print(f"Successfully processed {len(processed_files)} file(s)")
-            
-            # Return the first processed file (for backward compatibility)
-            return processed_files[0]
+            return processed_files
                 
         except Exception as e:
             print(f"Error processing documents: {e}")
-            return None
\ No newline at end of file
+            return []
@@ -0,0 +1,150 @@
+import re
+
+from llm_batching import EXTRACTION_FIELDS
+
+# Words that start the next part of a certificate sentence, so a field value stops before them.
+# OCR text comes back as one space-joined line, so line breaks cannot be relied on.
+NAME_STOP_WORDS = (
+    r"has|have|had|is|was|who|with|for|from|of|on|in|at|during|held|securing|secured|obtaining|obtained|"
+    r"son|daughter|s/o|d/o|bearing|enrol(?:l)?ment|roll|reg(?:istration)?|cgpa|sgpa|gpa|grade|date|dated|"
+    r"certificate|course|programme|program|duration|awarded|name|father|mother|guardian|husband|parent"
+)
+# Course titles contain "of" and "in" themselves ("Bachelor of Technology in ...")
+COURSE_STOP_WORDS = (
+    r"with|on|held|from|during|securing|secured|obtaining|obtained|enrol(?:l)?ment|roll|reg(?:istration)?|"
+    r"cgpa|sgpa|gpa|grade|date|dated|duration|conducted|organi[sz]ed|by|and\s+(?:has|is|was)"
+)
+
+
+def value_end(stop_words):
+    return rf"(?=\s+(?:{stop_words})\b|\s*[,;|]|\.(?:\s|$)|\s*\n|\s*$)"
+
+
+NAME_END = value_end(NAME_STOP_WORDS)
+COURSE_END = value_end(COURSE_STOP_WORDS)
+
+ID_VALUE = r"([A-Z0-9][A-Z0-9/\-]{3,24})"
+NAME_VALUE = r"((?:Mr\.?\s+|Ms\.?\s+|Mrs\.?\s+|Dr\.?\s+)?[A-Za-z][A-Za-z.'\-]*(?:\s+[A-Za-z][A-Za-z.'\-]*){0,5}?)"
+COURSE_VALUE = r"([A-Za-z0-9][A-Za-z0-9&+#().'\-]*(?:\s+[A-Za-z0-9&+#().'\-]+){0,11}?)"
+GRADE_VALUE = r"(\d{1,2}(?:\.\d{1,2})?)"
+
+# (pattern, confidence) per field, strongest cue first. Labelled values ("Enrollment No: X")
+# score highest, sentence templates ("certify that X has ...") a little lower and bare shapes lowest.
+FIELD_RULES = {
+    "EnrollmentNo": [
+        (re.compile(rf"\benrol(?:l)?ment\s*(?:no|number|num|#)?\.?\s*[:\-]?\s*{ID_VALUE}", re.IGNORECASE), 0.95),
+        (re.compile(rf"\b(?:roll|registration|reg\.?)\s*(?:no|number)\.?\s*[:\-]?\s*{ID_VALUE}", re.IGNORECASE), 0.85),
+        (re.compile(r"\b([A-Z]{2,5}\d{6,12})\b"), 0.6),
+    ],
+    "Name": [
+        (re.compile(rf"\bname\s*(?:of\s+(?:the\s+)?(?:student|candidate))?\s*[:\-]\s*{NAME_VALUE}{NAME_END}", re.IGNORECASE), 0.95),
+        (re.compile(rf"\bcertif(?:y|ies)\s+that\s+{NAME_VALUE}{NAME_END}", re.IGNORECASE), 0.9),
+        (re.compile(rf"\b(?:awarded|presented)\s+to\s+{NAME_VALUE}{NAME_END}", re.IGNORECASE), 0.85),
+    ],
+    "Course": [
+        (re.compile(rf"\b(?:course|programme|program)\s*(?:name|title)?\s*[:\-]\s*{COURSE_VALUE}{COURSE_END}", re.IGNORECASE), 0.95),
+        (re.compile(rf"\bcompleted\s+(?:the\s+|a\s+|an\s+)?(?:(?:course|programme|program)\s+(?:on\s+|in\s+|titled\s+)?)?{COURSE_VALUE}{COURSE_END}", re.IGNORECASE), 0.85),
+        (re.compile(rf"\b(?:degree|diploma)\s+(?:of|in)\s+{COURSE_VALUE}{COURSE_END}", re.IGNORECASE), 0.8),
+        (re.compile(rf"\b((?:bachelor|master|doctor)\s+of\s+[A-Za-z][A-Za-z&.'\-]*(?:\s+[A-Za-z&.'\-]+){{0,8}}?){COURSE_END}", re.IGNORECASE), 0.75),
+    ],
+    "CGPA": [
+        (re.compile(rf"\bc\.?\s?g\.?\s?p\.?\s?a\.?\s*(?:of|:|\-|=)?\s*{GRADE_VALUE}", re.IGNORECASE), 0.95),
+        (re.compile(rf"\b(?:grade\s+point\s+average|gpa)\s*(?:of|:|\-|=)?\s*{GRADE_VALUE}", re.IGNORECASE), 0.85),
+    ],
+}
+
+# Labels that name someone other than the certificate holder ("Father's Name: ...")
+RELATIVE_LABEL = re.compile(r"\b(?:father|mother|guardian|husband|wife|spouse|parent)(?:'?s)?\s*$", re.IGNORECASE)
+NAME_LABEL = re.compile(r"\bname\s*[:\-]", re.IGNORECASE)
+
+# Trailing words the lazy name/course captures can pick up from the template itself
+TRAILING_NOISE = re.compile(r"(?:\s+(?:the|a|an|and|mr|ms|mrs|dr))+$", re.IGNORECASE)
+
+
+def valid_value(field, value):
+    """Shape checks; a match that fails them is ignored"""
+    if field == "EnrollmentNo":
+        return any(char.isdigit() for char in value) and 4 <= len(value) <= 25
+    if field == "Name":
+        words = value.split()
+        return 1 <= len(words) <= 6 and all(any(char.isalpha() for char in word) for word in words)
+    if field == "Course":
+        return len(value) >= 2 and any(char.isalpha() for char in value)
+    if field == "CGPA":
+        try:
+            return 0 <= float(value) <= 10
+        except ValueError:
+            return False
+    return True
+
+
+def clean_value(field, value):
+    value = re.sub(r"\s+", " ", value).strip(" :-,.")
+    if field in ("Name", "Course"):
+        value = TRAILING_NOISE.sub("", value)
+    if field == "EnrollmentNo":
+        # Case kept: records are looked up by the exact enrollment number
+        value = value.strip("/-")
+    return value
+
+
+def line_of(text, position):
+    start = text.rfind("\n", 0, position) + 1
+    end = text.find("\n", position)
+    return text[start:] if end == -1 else text[start:end]
+
+
+def extract_field(field, ocr_text):
+    """
+    Best value of one field and its confidence
+
+    The first (strongest) rule with a valid match wins. Confidence drops when
+    the text holds several different values for the field, since the template
+    is then not the simple one the rule expects, and when the name shares its
+    line with other name labels. Names labelled as a relative's are skipped.
+    """
+    for pattern, confidence in FIELD_RULES[field]:
+        values = []
+        crowded = False
+        for match in pattern.finditer(ocr_text):
+            if field == "Name":
+                if RELATIVE_LABEL.search(ocr_text[max(0, match.start() - 20):match.start()]):
+                    continue
+                crowded = crowded or len(NAME_LABEL.findall(line_of(ocr_text, match.start()))) > 1
+            value = clean_value(field, match.group(1))
+            if value and valid_value(field, value) and value not in values:
+                values.append(value)
+        if values:
+            if len(values) > 1:
+                confidence *= 0.5
+            if crowded:
+                confidence *= 0.8
+            return values[0], confidence
+    return None, 0.0
+
+
+def extract_fields(ocr_text):
+    """
+    Rule-based extraction of the certificate fields from OCR text
+
+    Returns:
+        (fields, confidence) dicts keyed by field name; a field that no rule
+        found is None with confidence 0
+    """
+    fields = {}
+    confidence = {}
+    for field in EXTRACTION_FIELDS:
+        fields[field], confidence[field] = extract_field(field, ocr_text or "")
+    return fields, confidence
+
+
+def unresolved_fields(confidence, threshold):
+    return [field for field in EXTRACTION_FIELDS if confidence[field] < threshold]
+
+
+def merge_fields(local, fallback, unresolved):
+    """Local values for the resolved fields, the fallback (LLM) values for the rest"""
+    merged = dict(local)
+    for field in unresolved:
+        merged[field] = (fallback or {}).get(field)
+    return merged
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import re
+
+EXTRACTION_FIELDS = ["EnrollmentNo", "Name", "Course", "CGPA"]
+
+EXTRACTION_SYSTEM_PROMPT = """You are an assistant that extracts structured fields from OCR text of certificates.
+You will receive a JSON array of certificates, each with an "id" and its "ocr_text".
+Return only a valid JSON array with one object per certificate, in the form
+{"id": <id>, "EnrollmentNo": ..., "Name": ..., "Course": ..., "CGPA": ...}.
+Use null for fields that are not present. Do not add any other text."""
+
+COMPARISON_SYSTEM_PROMPT = """You are a checking AI. You will receive a JSON array of items, each with an "id",
+the "database" data and the "certificate" data. For every item check whether the data in the certificate
+and the data in database are same or not. Have strict checking for key sections like enrollment number,
+but you can be slightly lenient for names and other non-important sections.
+Return only a valid JSON array with one object per item, in the form {"id": <id>, "match": true or false}.
+Do not add any other text."""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token), good enough for budgeting"""
+    return len(text) // 4 + 1
+
+
+def chunk_items(items, max_items, token_budget):
+    """
+    Split (id, payload) items into batches of at most max_items whose
+    serialized payloads stay under token_budget. An item that is larger than
+    the budget on its own still gets a batch of its own.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+
+    for item in items:
+        item_tokens = estimate_tokens(json.dumps(item[1]))
+        if current and (len(current) >= max_items or current_tokens + item_tokens > token_budget):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += item_tokens
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_extraction_messages(batch):
+    payload = [{"id": item_id, "ocr_text": ocr_text} for item_id, ocr_text in batch]
+    return [
+        {"role": "system", "content": EXTRACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload)},
+    ]
+
+
+def build_comparison_messages(batch):
+    payload = [
+        {"id": item_id, "database": pair["database"], "certificate": pair["certificate"]}
+        for item_id, pair in batch
+    ]
+    return [
+        {"role": "system", "content": COMPARISON_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload)},
+    ]
+
+
+def parse_batch_response(content, ids):
+    """
+    Parse a JSON array reply into {id: object}. Returns None when the reply
+    is not valid JSON or does not cover every requested id, so the caller can
+    split the batch and retry.
+    """
+    match = re.search(r"\[.*\]", content, re.DOTALL)
+    if not match:
+        return None
+
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+
+    results = {}
+    for item in items:
+        if isinstance(item, dict) and "id" in item:
+            results[str(item["id"])] = item
+
+    if any(str(item_id) not in results for item_id in ids):
+        return None
+    return {item_id: results[str(item_id)] for item_id in ids}
+
+
+def run_batches(invoke, items, build_messages, default, max_items, token_budget):
+    """
+    Send items to the LLM in batches. A batch whose reply cannot be parsed (or
+    whose call fails, e.g. on a context length error) is split in half and
+    retried; a single item that still fails gets `default`.
+
+    Args:
+        invoke: Callable taking a list of messages and returning the reply text
+        items: List of (id, payload) tuples
+        build_messages: Builds the prompt messages for a batch
+        default: Result used for items that could not be resolved
+
+    Returns:
+        Dict of id -> parsed object
+    """
+    results = {}
+    pending = chunk_items(items, max_items, token_budget)
+
+    while pending:
+        batch = pending.pop(0)
+        ids = [item_id for item_id, _ in batch]
+        try:
+            parsed = parse_batch_response(invoke(build_messages(batch)), ids)
+        except Exception as e:
+            print(f"Batched LLM call failed for {len(batch)} item(s): {e}")
+            parsed = None
+
+        if parsed is not None:
+            results.update(parsed)
+        elif len(batch) > 1:
+            middle = len(batch) // 2
+            pending[:0] = [batch[:middle], batch[middle:]]
+        else:
+            results[ids[0]] = dict(default)
+
+    return results
+
+
+async def arun_batches(ainvoke, items, build_messages, default, max_items, token_budget, semaphore):
+    """Async variant of run_batches that sends the batches concurrently under a semaphore"""
+
+    async def run_batch(batch):
+        ids = [item_id for item_id, _ in batch]
+        try:
+            async with semaphore:
+                content = await ainvoke(build_messages(batch))
+            parsed = parse_batch_response(content, ids)
+        except Exception as e:
+            print(f"Batched LLM call failed for {len(batch)} item(s): {e}")
+            parsed = None
+
+        if parsed is not None:
+            return parsed
+        if len(batch) > 1:
+            middle = len(batch) // 2
+            halves = await asyncio.gather(run_batch(batch[:middle]), run_batch(batch[middle:]))
+            return {**halves[0], **halves[1]}
+        return {ids[0]: dict(default)}
+
+    batches = chunk_items(items, max_items, token_budget)
+    results = {}
+    for parsed in await asyncio.gather(*(run_batch(batch) for batch in batches)):
+        results.update(parsed)
+    return results
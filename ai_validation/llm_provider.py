@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from llm_batching import estimate_tokens
+
+FIELD_PATTERNS = {
+    "EnrollmentNo": re.compile(r"Enrol(?:l)?ment\s*(?:No|Number)\.?\s*[:\-]?\s*([A-Z0-9/\-]+)", re.IGNORECASE),
+    "Name": re.compile(r"certify\s+that\s+(.+?)(?:\n|$)", re.IGNORECASE),
+    "Course": re.compile(r"completed\s+(?:the\s+)?(.+?)(?:\n|$)", re.IGNORECASE),
+    "CGPA": re.compile(r"CGPA\s*(?:of)?\s*[:\-]?\s*(\d+(?:\.\d+)?)", re.IGNORECASE),
+}
+
+
+def extract_fields(ocr_text):
+    """What a well-behaved LLM would extract from certificate text"""
+    fields = {}
+    for field, pattern in FIELD_PATTERNS.items():
+        match = pattern.search(ocr_text or "")
+        fields[field] = match.group(1).strip() if match else None
+    return fields
+
+
+def normalize(value):
+    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+
+
+def records_match(database, certificate):
+    """Strict on the enrollment number, case and whitespace insensitive on the name"""
+    return (
+        normalize(database.get("enrollmentNo")) == normalize(certificate.get("EnrollmentNo"))
+        and normalize(database.get("name")) == normalize(certificate.get("Name"))
+    )
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatGroq that answers the pipeline's prompts by rule
+
+    Handles the certificate type classification, single and batched field
+    extraction, and single and batched record comparison. Latency, jitter
+    and failures are simulated from a seeded generator, so a load test
+    replays the same way every time.
+    """
+
+    latency_seconds: float = 0.0
+    jitter_seconds: float = 0.0
+    error_rate: float = 0.0
+    classification: str = "ecertificate"  # "ecertificate", "human" or "mixed"
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _delay(self):
+        delay = self.latency_seconds
+        if self.jitter_seconds:
+            delay += self._rng.uniform(0, self.jitter_seconds)
+        return delay
+
+    def _classify(self, content):
+        if self.classification != "mixed":
+            return self.classification
+        # Same image, same answer; roughly half the uploads take the photo path
+        image_url = next((part["image_url"]["url"] for part in content if part.get("type") == "image_url"), "")
+        digest = hashlib.sha256(image_url.encode("utf-8")).digest()
+        return "ecertificate" if digest[0] % 2 == 0 else "human clicked image"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        if self.error_rate and self._rng.random() < self.error_rate:
+            raise RuntimeError("Injected LLM failure")
+
+        system = next((str(message.content) for message in messages if message.type == "system"), "")
+        user = messages[-1].content
+
+        if not isinstance(user, str):
+            # Vision prompt: the certificate type classification
+            return self._classify(user)
+
+        if "JSON array of certificates" in system:
+            return json.dumps([
+                {"id": item["id"], **extract_fields(item["ocr_text"])}
+                for item in json.loads(user)
+            ])
+        if "JSON array of items" in system:
+            return json.dumps([
+                {"id": item["id"], "match": records_match(item["database"], item["certificate"])}
+                for item in json.loads(user)
+            ])
+        if "extracts structured fields" in system:
+            return json.dumps(extract_fields(user.split("OCR Text:", 1)[-1]))
+        if "checking AI" in system:
+            match = re.search(r"database data: (.*), certificate data: (.*)", user, re.DOTALL)
+            if not match:
+                return "false"
+            return "true" if records_match(json.loads(match.group(1)), json.loads(match.group(2))) else "false"
+        return ""
+
+    def _result(self, messages, content):
+        prompt_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))],
+            llm_output={"token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(content)}}
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._result(messages, self._reply(messages))
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._result(messages, self._reply(messages))
+
+
+LLM_PROVIDERS = ("groq", "fake")
+
+
+def create_chat_model(model, callbacks=None):
+    """
+    Build the chat model selected by LLM_PROVIDER
+
+    groq (default) talks to the Groq API. fake answers locally with FakeChatModel,
+    tuned with FAKE_LLM_LATENCY_MS, FAKE_LLM_JITTER_MS, FAKE_LLM_ERROR_RATE,
+    FAKE_LLM_CLASSIFICATION and FAKE_LLM_SEED.
+    """
+    provider = os.getenv("LLM_PROVIDER", "groq").lower()
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {provider!r}, expected one of {LLM_PROVIDERS}")
+
+    if provider == "fake":
+        print(f"Using the fake LLM provider in place of {model}")
+        return FakeChatModel(
+            latency_seconds=float(os.getenv("FAKE_LLM_LATENCY_MS", "0")) / 1000,
+            jitter_seconds=float(os.getenv("FAKE_LLM_JITTER_MS", "0")) / 1000,
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            classification=os.getenv("FAKE_LLM_CLASSIFICATION", "ecertificate"),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0")),
+            callbacks=callbacks
+        )
+
+    from langchain_groq import ChatGroq
+    return ChatGroq(model=model, callbacks=callbacks)
@@ -0,0 +1,205 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; wide enough for a 5 ms cache hit and a two minute LLM call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        """Process-wide collection of metrics, rendered in the Prometheus text format"""
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, function=None):
+        """function, when given, is called at scrape time for the value of an unlabelled gauge"""
+        super().__init__(name, documentation, labelnames, registry)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [f"{self.name} {format_value(self.function())}"]
+            except Exception as e:
+                print(f"Could not collect {self.name}: {e}")
+                return []
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = format_labels(self.labelnames, key, [("le", format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# Metrics shared by the modules of the pipeline; app-specific gauges are registered in app.py
+STAGE_DURATION = Histogram(
+    "verify_stage_duration_seconds", "Time spent in each LangGraph node", ["stage"]
+)
+LLM_REQUEST_DURATION = Histogram(
+    "verify_llm_request_duration_seconds", "Latency of LLM calls", ["model", "outcome"]
+)
+LLM_TOKENS = Counter(
+    "verify_llm_tokens_total", "Tokens reported by the LLM provider", ["model", "kind"]
+)
+MONGO_QUERY_DURATION = Histogram(
+    "verify_mongo_query_duration_seconds", "Latency of student record lookups", ["operation"]
+)
+RECORD_CACHE_REQUESTS = Counter(
+    "verify_record_cache_requests_total", "Student record cache lookups", ["result"]
+)
+DETECTION_INFERENCE_DURATION = Histogram(
+    "verify_detection_inference_seconds", "YOLO inference time per batch", ["backend"]
+)
+DETECTION_IMAGES = Counter(
+    "verify_detection_images_total", "Images run through the certificate detector", ["backend"]
+)
+OCR_DURATION = Histogram(
+    "verify_ocr_duration_seconds", "OCR time per certificate", ["engine"]
+)
+OCR_PAGES = Counter(
+    "verify_ocr_pages_total", "Certificates by the OCR engine whose text was used", ["engine"]
+)
+OCR_ESCALATIONS = Counter(
+    "verify_ocr_escalations_total", "Tesseract results handed to EasyOCR, by failed quality check", ["reason"]
+)
+CLASSIFICATIONS = Counter(
+    "verify_classifications_total", "Certificate type decisions by who made them", ["method"]
+)
+FIELD_EXTRACTIONS = Counter(
+    "verify_field_extractions_total", "Certificate fields by whether the rules or the LLM extracted them", ["field", "method"]
+)
+RECORD_COMPARISONS = Counter(
+    "verify_record_comparisons_total", "Local record comparisons by decision; borderline ones go to the LLM", ["decision"]
+)
+SESSIONS = Counter(
+    "verify_sessions_total", "Finished sessions by final status", ["status"]
+)
@@ -271,20 +271,235 @@
 
 import easyocr
 import os
+import queue
+import re
+import threading
+import numpy as np
+from metrics import OCR_DURATION, OCR_PAGES, OCR_ESCALATIONS
 # import ssl
 # ssl._create_default_https_context = ssl._create_unverified_context
 
 
-def ocr_checker(final_state):
-    reader = easyocr.Reader(['en'])  # add more languages if needed
+class OCREngine:
+    def __init__(self, languages=None, pool_size=1, gpu=False):
+        """
+        Long-lived EasyOCR engine shared by every session
+
+        Args:
+            languages: EasyOCR language codes
+            pool_size: Number of readers; each reader serves one thread at a time
+            gpu: Run the readers on GPU
+        """
+        self.languages = languages or ['en']
+        self.pool_size = pool_size
+        self._readers = queue.Queue()
+
+        # Load the CRAFT detector and recognizer weights once at startup
+        for _ in range(pool_size):
+            self._readers.put(easyocr.Reader(self.languages, gpu=gpu))
+        print(f"OCR engine loaded with {pool_size} reader(s)")
+
+    def warmup(self):
+        """Run every reader once so the first real request only pays for inference"""
+        dummy_img = np.full((64, 256, 3), 255, dtype=np.uint8)
+        readers = [self._readers.get() for _ in range(self.pool_size)]
+        try:
+            for reader in readers:
+                reader.readtext(dummy_img, detail=0)
+        finally:
+            for reader in readers:
+                self._readers.put(reader)
+        print("OCR engine warmed up")
+
+    def read_text(self, image):
+        """OCR an image path or array, blocking until a reader is free"""
+        reader = self._readers.get()
+        try:
+            with OCR_DURATION.time(engine="easyocr"):
+                return " ".join(reader.readtext(image, detail=0))  # get only text
+        finally:
+            self._readers.put(reader)
+
+
+# Common English and certificate words. Names and course titles are not in it, so a clean read
+# of a certificate scores well below 1; garbled OCR of a photo scores close to 0.
+# OCR_DICTIONARY_PATH (one word per line, e.g. /usr/share/dict/words) extends it.
+CERTIFICATE_VOCABULARY = set("""
+the and for that this with has have been from was were are his her their who which will shall
+into upon all any not its our your you they them than then also only such same under over
+certify certified certifies certificate certification hereby awarded award presented conferred
+completed completion successfully successful participation participated appreciation achievement
+excellence merit recognition course program programme degree diploma bachelor master doctor
+university college institute institution school academy department faculty board council
+technology engineering science sciences arts commerce management business administration
+computer applications information electronics electrical mechanical civil chemical physics
+chemistry mathematics biology economics history english language studies research training
+workshop seminar conference internship project semester year years month months duration
+enrollment enrolment number name student candidate roll registration grade grades cgpa sgpa
+percentage marks class division first second third distinction honours honors passed
+date dated held during session academic examination examinations exam result results
+director principal dean registrar chancellor controller coordinator head signature seal
+issued valid verify verified authority official online national international annual
+""".split())
+
+# Labels and phrases that a readable certificate nearly always contains
+FIELD_ANCHORS = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r"certif", r"enrol(?:l)?ment|roll\s*no|registration", r"\bname\b", r"c\.?g\.?p\.?a|grade|marks",
+        r"course|program|degree|diploma", r"universit|college|institut|school|academy",
+        r"completed|awarded|presented|conferred|passed"
+    )
+]
+
+
+def load_vocabulary(path=None):
+    vocabulary = set(CERTIFICATE_VOCABULARY)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            vocabulary.update(line.strip().lower() for line in f if line.strip())
+    return vocabulary
+
+
+def assess_quality(text, vocabulary):
+    """
+    Cheap quality signals of an OCR result
+
+    Returns:
+        Dict with the dictionary hit rate of the words of 3+ letters, the
+        number of field anchors present and the word count
+    """
+    words = re.findall(r"[A-Za-z]{3,}", text or "")
+    hits = sum(1 for word in words if word.lower() in vocabulary)
+    return {
+        "hit_rate": hits / len(words) if words else 0.0,
+        "anchors": sum(1 for anchor in FIELD_ANCHORS if anchor.search(text or "")),
+        "words": len(words),
+    }
+
+
+class TesseractEngine:
+    def __init__(self, lang="eng", config="--oem 1 --psm 3"):
+        """
+        Tesseract OCR through pytesseract; raises when the binary is missing
+
+        Each call runs a tesseract process, so concurrent calls from the
+        OCR threads need no reader pool.
+        """
+        import pytesseract
+        self.pytesseract = pytesseract
+        self.lang = lang
+        self.config = config
+        print(f"Tesseract {pytesseract.get_tesseract_version()} available")
+
+    def read_text(self, image):
+        """
+        OCR an RGB array
+
+        Returns:
+            (text with one line per detected line, mean word confidence 0-100)
+        """
+        with OCR_DURATION.time(engine="tesseract"):
+            data = self.pytesseract.image_to_data(
+                image, lang=self.lang, config=self.config, output_type=self.pytesseract.Output.DICT
+            )
+
+        lines = {}
+        confidences = []
+        for word, confidence, block, paragraph, line in zip(
+            data["text"], data["conf"], data["block_num"], data["par_num"], data["line_num"]
+        ):
+            if not word.strip() or float(confidence) < 0:
+                continue
+            lines.setdefault((block, paragraph, line), []).append(word.strip())
+            confidences.append(float(confidence))
+
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return text, (sum(confidences) / len(confidences) if confidences else 0.0)
+
+
+class TieredOCREngine:
+    def __init__(self, fallback, min_hit_rate=0.2, min_anchors=2, min_confidence=60, dictionary_path=None, lang="eng"):
+        """
+        Tesseract first, EasyOCR only for pages Tesseract reads badly
+
+        Clean e-certificates come back from Tesseract in a fraction of
+        EasyOCR's time. A result is kept when its dictionary hit rate, field
+        anchors and mean word confidence all clear their minimum; otherwise
+        the page is read again by the fallback engine. Without Tesseract every
+        page goes to the fallback.
+
+        Args:
+            fallback: Engine with read_text(image) used for escalations (OCREngine)
+            min_hit_rate: Share of words that must be dictionary words
+            min_anchors: Number of FIELD_ANCHORS that must be present
+            min_confidence: Minimum mean Tesseract word confidence (0-100)
+            dictionary_path: Word list added to the built-in vocabulary
+        """
+        self.fallback = fallback
+        self.min_hit_rate = min_hit_rate
+        self.min_anchors = min_anchors
+        self.min_confidence = min_confidence
+        self.vocabulary = load_vocabulary(dictionary_path)
+        try:
+            self.tesseract = TesseractEngine(lang=lang)
+        except Exception as e:
+            print(f"Tesseract unavailable ({e}), every page goes to EasyOCR")
+            self.tesseract = None
+
+    def warmup(self):
+        self.fallback.warmup()
+
+    def escalation_reason(self, text, confidence):
+        """Why a Tesseract result is not good enough, or None when it is"""
+        quality = assess_quality(text, self.vocabulary)
+        if quality["hit_rate"] < self.min_hit_rate:
+            return "hit_rate"
+        if quality["anchors"] < self.min_anchors:
+            return "anchors"
+        if confidence < self.min_confidence:
+            return "confidence"
+        return None
+
+    def read_text(self, image):
+        if self.tesseract is None:
+            OCR_PAGES.inc(engine="easyocr")
+            return self.fallback.read_text(image)
+
+        try:
+            text, confidence = self.tesseract.read_text(image)
+            reason = self.escalation_reason(text, confidence)
+        except Exception as e:
+            print(f"Tesseract failed: {e}")
+            reason = "error"
+
+        if reason is None:
+            OCR_PAGES.inc(engine="tesseract")
+            return text
+
+        print(f"Tesseract result rejected ({reason}), escalating to EasyOCR")
+        OCR_ESCALATIONS.inc(reason=reason)
+        OCR_PAGES.inc(engine="easyocr")
+        return self.fallback.read_text(image)
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_default_engine():
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = OCREngine()
+    return _default_engine
+
+
+def ocr_checker(final_state, engine=None):
+    engine = engine or get_default_engine()
     ocr_results = {}
-    processed_folder = "./processed_certificates"
+    artifacts = final_state["artifacts"]
 
     for file in final_state["accepted_certi"]:
-        if file.endswith(".png"):
-            img_path = os.path.join(processed_folder, file)
-            result = reader.readtext(img_path, detail=0)  # get only text
-            ocr_results[file] = " ".join(result)
+        if file.endswith(".png") and file in artifacts:
+            ocr_results[file] = engine.read_text(artifacts.rgb(file))
 
     final_state["ocr_texts"] = ocr_results
-    return final_state
\ No newline at end of file
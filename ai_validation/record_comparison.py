@@ -0,0 +1,198 @@
+import re
+from difflib import SequenceMatcher
+
+# Database keys each certificate field may be stored under, compared case-insensitively
+RECORD_KEYS = {
+    "EnrollmentNo": ["enrollmentNo", "enrolmentNo", "enrollment_no", "rollNo"],
+    "Name": ["name", "studentName", "fullName", "student_name"],
+    "Course": ["course", "courseName", "program", "programme", "degree"],
+    "CGPA": ["cgpa", "gpa"],
+}
+
+# Share of the score each compared field carries; the enrollment number is a gate, not a weight
+FIELD_WEIGHTS = {"Name": 0.5, "Course": 0.3, "CGPA": 0.2}
+
+# Lowest score at which a field counts as agreeing; any field below it rules out "match"
+FIELD_AGREEMENT = {"Course": 0.8, "CGPA": 1.0}
+
+# Lowest fuzzy ratio at which two name words count as the same word (OCR slips, spelling variants)
+NAME_WORD_MATCH = 0.75
+
+HONORIFICS = {"mr", "ms", "mrs", "miss", "dr", "shri", "smt", "kumari", "prof"}
+
+# Degree abbreviations expanded before comparing courses
+ABBREVIATIONS = {
+    "btech": "bachelor of technology",
+    "be": "bachelor of engineering",
+    "bsc": "bachelor of science",
+    "bca": "bachelor of computer applications",
+    "bcom": "bachelor of commerce",
+    "ba": "bachelor of arts",
+    "bba": "bachelor of business administration",
+    "mtech": "master of technology",
+    "me": "master of engineering",
+    "msc": "master of science",
+    "mca": "master of computer applications",
+    "mcom": "master of commerce",
+    "ma": "master of arts",
+    "mba": "master of business administration",
+    "phd": "doctor of philosophy",
+    "cse": "computer science and engineering",
+    "ece": "electronics and communication engineering",
+    "it": "information technology",
+}
+FILLER_WORDS = {"of", "in", "and", "the", "with", "for", "&"}
+
+
+def record_value(record, field):
+    """Value of a certificate field in a database record, whatever key it is stored under"""
+    lowered = {str(key).lower(): value for key, value in record.items()}
+    for key in RECORD_KEYS[field]:
+        value = lowered.get(key.lower())
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def normalize_id(value):
+    """Upper case without whitespace or separators, so "en-2021 000" equals "EN2021000" """
+    return re.sub(r"[\s\-/_.]", "", str(value)).upper()
+
+
+def tokens(value, expand=False):
+    words = re.sub(r"[^a-z0-9 ]", " ", str(value).lower().replace(".", "")).split()
+    if expand:
+        words = " ".join(ABBREVIATIONS.get(word, word) for word in words).split()
+        words = [word for word in words if word not in FILLER_WORDS]
+    return [word for word in words if word not in HONORIFICS]
+
+
+def token_score(a, b):
+    """Fuzzy similarity of one word pair; an initial is only half a match for the word it starts"""
+    if a == b:
+        return 1.0
+    if len(a) == 1 or len(b) == 1:
+        return 0.5 if a[0] == b[0] else 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def token_similarity(a, b):
+    """
+    Order-insensitive fuzzy similarity of two word lists, between 0 and 1
+
+    Every word of the shorter list is paired with its best match in the
+    longer one; a word left out of a course title ("Engineering") costs a
+    little through the coverage term instead of failing the match.
+    """
+    if not a or not b:
+        return 0.0
+    shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+    matched = sum(max(token_score(word, other) for other in longer) for word in shorter) / len(shorter)
+    coverage = len(shorter) / len(longer)
+    return 0.85 * matched + 0.15 * coverage
+
+
+def word_status(word, others):
+    """"full" when another word matches it, "initial" when only an initial lines up with it, else "none" """
+    if max(token_score(word, other) for other in others) >= NAME_WORD_MATCH:
+        return "full"
+    if any((len(word) == 1 or len(other) == 1) and word[0] == other[0] for other in others):
+        return "initial"
+    return "none"
+
+
+def name_agreement(a, b):
+    """
+    Compare two names word by word, in both directions
+
+    Every word on each side needs a counterpart on the other. A word with no
+    counterpart on both sides ("Verma" against "Sharma") is a different
+    person. A word missing on one side only (a dropped surname, an extra
+    middle name) or an initial standing for a word can't be confirmed.
+
+    Returns:
+        (score, agreement): the mean best word score over both names, and
+        "match", "partial" or "conflict"
+    """
+    if not a or not b:
+        return 0.0, "conflict"
+    a_scores = [max(token_score(word, other) for other in b) for word in a]
+    b_scores = [max(token_score(word, other) for other in a) for word in b]
+    score = sum(a_scores + b_scores) / (len(a_scores) + len(b_scores))
+
+    a_status = [word_status(word, b) for word in a]
+    b_status = [word_status(word, a) for word in b]
+    if "none" in a_status and "none" in b_status:
+        return score, "conflict"
+    if all(status == "full" for status in a_status + b_status):
+        return score, "match"
+    return score, "partial"
+
+
+def compare_field(field, database_value, certificate_value, cgpa_tolerance):
+    if field == "EnrollmentNo":
+        return 1.0 if normalize_id(database_value) == normalize_id(certificate_value) else 0.0
+    if field == "Course":
+        return token_similarity(tokens(database_value, expand=True), tokens(certificate_value, expand=True))
+    if field == "CGPA":
+        try:
+            return 1.0 if abs(float(database_value) - float(certificate_value)) <= cgpa_tolerance else 0.0
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+def compare_records(database, certificate, accept_score=0.9, reject_score=0.6, cgpa_tolerance=0.05):
+    """
+    Compare a database record with the fields read off a certificate
+
+    Strict on the enrollment number, word by word on the name, fuzzy on the
+    course, numeric tolerance on CGPA. Fields missing on either side are left
+    out of the score rather than counted against it. A name with a word that
+    contradicts the record rejects on its own. "match" needs every name word
+    confirmed and every other compared field in agreement, whatever the score.
+
+    Returns:
+        Report dict with per-field scores, the weighted "score" and the
+        "decision": "match", "mismatch", or "borderline" when the local
+        comparison cannot settle it and a second opinion is needed
+    """
+    fields = {}
+    name_status = None
+    for field in RECORD_KEYS:
+        database_value = record_value(database, field)
+        certificate_value = certificate.get(field)
+        if database_value is None or certificate_value in (None, ""):
+            fields[field] = {"database": database_value, "certificate": certificate_value, "score": None}
+            continue
+        if field == "Name":
+            score, name_status = name_agreement(tokens(database_value), tokens(certificate_value))
+        else:
+            score = compare_field(field, database_value, certificate_value, cgpa_tolerance)
+        fields[field] = {"database": database_value, "certificate": certificate_value, "score": round(score, 3)}
+    if name_status is not None:
+        fields["Name"]["agreement"] = name_status
+
+    enrollment = fields["EnrollmentNo"]["score"]
+    compared = [field for field in FIELD_WEIGHTS if fields[field]["score"] is not None]
+
+    if enrollment == 0.0:
+        score, decision = 0.0, "mismatch"
+    elif enrollment is None or "Name" not in compared:
+        # Nothing identifying to go on locally
+        score, decision = None, "borderline"
+    else:
+        total_weight = sum(FIELD_WEIGHTS[field] for field in compared)
+        score = sum(FIELD_WEIGHTS[field] * fields[field]["score"] for field in compared) / total_weight
+        agreeing = all(
+            fields[field]["score"] >= FIELD_AGREEMENT[field] for field in compared if field in FIELD_AGREEMENT
+        )
+        if name_status == "conflict" or score <= reject_score or fields["Name"]["score"] <= reject_score:
+            # A clearly different name is a mismatch however well the rest agrees
+            decision = "mismatch"
+        elif score >= accept_score and name_status == "match" and agreeing:
+            decision = "match"
+        else:
+            decision = "borderline"
+
+    return {"fields": fields, "score": None if score is None else round(score, 3), "decision": decision}
@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+
+class ResultCache:
+    def __init__(self, cache_dir="./result_cache", version="1", max_bytes=1024 ** 3, ttl_seconds=7 * 24 * 3600):
+        """
+        Content-addressed cache of pipeline results for uploaded files
+
+        Every entry is a folder named after the SHA-256 of the uploaded bytes
+        (mixed with the pipeline version) holding an entry.json with the stage
+        outputs and the final certificate images produced from that file.
+
+        Args:
+            cache_dir: Folder that holds the entries
+            version: Pipeline/model version; changing it invalidates every entry
+            max_bytes: Total size above which least recently used entries are evicted
+            ttl_seconds: Age after which an entry is no longer served
+        """
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, content_hash):
+        key = hashlib.sha256(f"{self.version}:{content_hash}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, content_hash):
+        """Return the cached entry for an upload, or None on a miss"""
+        entry_dir = self._entry_dir(content_hash)
+        entry_path = os.path.join(entry_dir, "entry.json")
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry["created"] > self.ttl_seconds:
+            self._remove(entry_dir)
+            return None
+
+        # The entry.json mtime doubles as the last access time for LRU eviction
+        try:
+            os.utime(entry_path)
+        except OSError:
+            # Evicted by another thread since it was read
+            return None
+        entry["dir"] = entry_dir
+        return entry
+
+    def restore_file(self, entry, name, destination):
+        """Copy a cached certificate image to destination; raises FileNotFoundError if the entry was evicted since get"""
+        shutil.copyfile(os.path.join(entry["dir"], name), destination)
+
+    def put(self, content_hash, entry, files):
+        """
+        Store stage outputs for an upload
+
+        Args:
+            content_hash: SHA-256 hex digest of the uploaded bytes
+            entry: JSON-serializable stage outputs
+            files: Dict of certificate name -> path of the image to keep
+        """
+        entry_dir = self._entry_dir(content_hash)
+        staging_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(staging_dir)
+
+        size = 0
+        for name, path in files.items():
+            destination = os.path.join(staging_dir, name)
+            shutil.copyfile(path, destination)
+            size += os.path.getsize(destination)
+
+        entry = {**entry, "created": time.time(), "size": size}
+        with open(os.path.join(staging_dir, "entry.json"), "w") as f:
+            json.dump(entry, f)
+
+        # Publish atomically so readers never see a half-written entry
+        with self._lock:
+            self._remove(entry_dir)
+            os.rename(staging_dir, entry_dir)
+            self._evict()
+
+    def _remove(self, entry_dir):
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def _evict(self):
+        entries = []
+        total_size = 0
+        now = time.time()
+
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            entry_dir = os.path.join(self.cache_dir, name)
+            entry_path = os.path.join(entry_dir, "entry.json")
+            try:
+                with open(entry_path) as f:
+                    entry = json.load(f)
+                last_used = os.path.getmtime(entry_path)
+            except (OSError, ValueError):
+                continue
+
+            if now - entry["created"] > self.ttl_seconds:
+                self._remove(entry_dir)
+                continue
+            entries.append((last_used, entry["size"], entry_dir))
+            total_size += entry["size"]
+
+        for last_used, size, entry_dir in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            self._remove(entry_dir)
+            total_size -= size
@@ -0,0 +1,94 @@
+import math
+import threading
+import time
+from collections import deque
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler cannot accept more work"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Processing queue is full, retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    def __init__(self, max_workers=2, max_queue_size=20):
+        """
+        Run pipeline jobs on a fixed pool of worker threads with a bounded queue
+
+        Args:
+            max_workers: Number of jobs that may run at the same time
+            max_queue_size: Number of jobs allowed to wait for a free worker
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._queue = deque()
+        self._running = set()
+        self._condition = threading.Condition()
+        self._durations = deque(maxlen=50)
+        self._workers = []
+
+        for index in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"pipeline-worker-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job_id, func, *args, **kwargs):
+        """Queue a job and return its 1-based position, or raise QueueFullError"""
+        with self._condition:
+            if len(self._queue) >= self.max_queue_size:
+                raise QueueFullError(self._estimate_wait(len(self._queue)))
+            self._queue.append((job_id, func, args, kwargs))
+            self._condition.notify()
+            return len(self._queue)
+
+    def is_full(self):
+        with self._condition:
+            return len(self._queue) >= self.max_queue_size
+
+    def retry_after(self):
+        """Seconds a rejected client should wait before trying again"""
+        with self._condition:
+            return self._estimate_wait(len(self._queue))
+
+    def position(self, job_id):
+        """1-based position of a queued job, or None once it has started"""
+        with self._condition:
+            for index, queued in enumerate(self._queue):
+                if queued[0] == job_id:
+                    return index + 1
+        return None
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "queued": len(self._queue),
+                "running": len(self._running),
+            }
+
+    def _estimate_wait(self, queued):
+        # Average recent job time multiplied by the number of "rounds" ahead of a new job
+        average = sum(self._durations) / len(self._durations) if self._durations else 30.0
+        rounds = math.ceil((queued + 1) / self.max_workers)
+        return max(1, int(average * rounds))
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                job_id, func, args, kwargs = self._queue.popleft()
+                self._running.add(job_id)
+
+            start_time = time.time()
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"[{job_id}] Unhandled error in scheduled job: {e}")
+            finally:
+                with self._condition:
+                    self._running.discard(job_id)
+                    self._durations.append(time.time() - start_time)
@@ -0,0 +1,184 @@
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urlparse
+
+TERMINAL_EVENTS = {"completed", "failed"}
+
+
+class SessionEvents:
+    def __init__(self, store, session_id):
+        """
+        Publishes a session's progress to the session store's event log
+
+        Every verdict is reported once, however many stages see the certificate
+        in the accepted or rejected list.
+        """
+        self.store = store
+        self.session_id = session_id
+        self._reported = set()
+        self._lock = threading.Lock()
+
+    def emit(self, event, **data):
+        try:
+            self.store.append_event(self.session_id, event, {"session_id": self.session_id, **data})
+        except Exception as e:
+            print(f"[{self.session_id}] Could not record {event} event: {e}")
+
+    def verdict(self, certificate, verdict, source=None):
+        with self._lock:
+            if (certificate, verdict) in self._reported:
+                return
+            self._reported.add((certificate, verdict))
+        self.emit("verdict", certificate=certificate, verdict=verdict, source=source)
+
+    def report_verdicts(self, state):
+        """Report the certificates a stage moved to the accepted or rejected list"""
+        for verdict, key in [("accepted", "accepted_certi"), ("rejected", "rejected_certi")]:
+            for certificate in state.get(key, []):
+                self.verdict(certificate, verdict, state.get("sources", {}).get(certificate))
+
+
+def format_sse(event):
+    """Encode a stored event as a Server-Sent Events message"""
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+def host_allowed(hostname, allowed_hosts):
+    """Exact match, or a subdomain of an entry written with a leading dot (".example.com")"""
+    hostname = (hostname or "").lower().rstrip(".")
+    for allowed in allowed_hosts:
+        allowed = allowed.lower().rstrip(".")
+        if hostname == allowed or (allowed.startswith(".") and hostname.endswith(allowed)):
+            return True
+    return False
+
+
+def resolve_public_address(hostname, port):
+    """
+    Resolve a webhook host, refusing it unless every address is public
+
+    Private, loopback, link-local (cloud metadata) and reserved addresses
+    are rejected so a callback cannot reach internal services.
+
+    Raises:
+        ValueError when the host does not resolve or resolves to a non-public address
+    """
+    try:
+        infos = socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"{hostname} does not resolve: {e}")
+    addresses = [info[4][0] for info in infos]
+    if not addresses:
+        raise ValueError(f"{hostname} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"{hostname} resolves to non-public address {address}")
+    return addresses[0]
+
+
+def is_valid_callback_url(url, allowed_hosts):
+    """http(s) URL on an allowed host that resolves to public addresses only"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    if not host_allowed(parsed.hostname, allowed_hosts):
+        return False
+    try:
+        resolve_public_address(parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+    except ValueError:
+        return False
+    return True
+
+
+class PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connects to an address resolved (and checked) beforehand, so DNS cannot change in between"""
+
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout, context=ssl.create_default_context())
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        # Certificate and SNI still use the hostname
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def post_once(url, body, headers, allowed_hosts, timeout):
+    """One POST to an allowed, public host; redirects are not followed. Returns the status"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not host_allowed(parsed.hostname, allowed_hosts):
+        raise ValueError(f"{parsed.hostname} is not an allowed webhook host")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    address = resolve_public_address(parsed.hostname, port)
+
+    connection_class = PinnedHTTPSConnection if parsed.scheme == "https" else PinnedHTTPConnection
+    connection = connection_class(parsed.hostname, port, address, timeout)
+    try:
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        connection.request("POST", path, body=body, headers=headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def post_webhook(url, payload, secret=None, retries=3, timeout=10, allowed_hosts=()):
+    """
+    POST the payload as JSON, retrying with exponential backoff
+
+    When a secret is set the body is signed with HMAC-SHA256 in the
+    X-Webhook-Signature header so receivers can verify the sender. The host
+    is checked against allowed_hosts and re-resolved on every attempt, and
+    the connection goes to the checked address; a redirect counts as a failure.
+
+    Returns:
+        True once the receiver answers with a 2xx status
+    """
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Webhook-Signature"] = f"sha256={signature}"
+
+    for attempt in range(retries):
+        try:
+            status = post_once(url, body, headers, allowed_hosts, timeout)
+            if 200 <= status < 300:
+                return True
+            print(f"Webhook {url} answered {status}")
+        except ValueError as e:
+            # Not a transient failure; retrying cannot help
+            print(f"Webhook {url} refused: {e}")
+            return False
+        except Exception as e:
+            print(f"Webhook {url} failed (attempt {attempt + 1}/{retries}): {e}")
+        if attempt + 1 < retries:
+            time.sleep(2 ** attempt)
+    return False
+
+
+def send_webhook(url, payload, secret=None, retries=3, timeout=10, on_done=None, allowed_hosts=()):
+    """Deliver the webhook on a daemon thread so the pipeline worker is not held up by the receiver"""
+    def deliver():
+        delivered = post_webhook(url, payload, secret, retries, timeout, allowed_hosts)
+        if on_done is not None:
+            on_done(delivered)
+
+    thread = threading.Thread(target=deliver, daemon=True)
+    thread.start()
+    return thread
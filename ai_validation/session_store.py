@@ -0,0 +1,245 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class SessionStore(ABC):
+    """Interface of the session stores; session data is a JSON-serializable dict"""
+
+    @abstractmethod
+    def create(self, session_id, data):
+        """Store a new session"""
+
+    @abstractmethod
+    def get(self, session_id):
+        """Return the session dict, or None when it does not exist"""
+
+    @abstractmethod
+    def update(self, session_id, **fields):
+        """Merge fields into an existing session; unknown sessions are ignored"""
+
+    @abstractmethod
+    def delete(self, session_id):
+        """Remove a session and its events"""
+
+    @abstractmethod
+    def list(self, status=None):
+        """Return every session, optionally only those with the given status"""
+
+    @abstractmethod
+    def evict_expired(self):
+        """Drop sessions not updated within the TTL and return their ids"""
+
+    @abstractmethod
+    def append_event(self, session_id, event, data):
+        """Append a progress event to the session's log and return its id (increasing per store)"""
+
+    @abstractmethod
+    def events_since(self, session_id, after_id=0, limit=100):
+        """Return the session's events with an id above after_id, oldest first"""
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl_seconds=24 * 3600):
+        """Single-process store, handy for development and tests"""
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._updated_at = {}
+        self._events = {}
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+
+    def create(self, session_id, data):
+        with self._lock:
+            self._sessions[session_id] = json.loads(json.dumps(data))
+            self._updated_at[session_id] = time.time()
+
+    def get(self, session_id):
+        with self._lock:
+            data = self._sessions.get(session_id)
+            return json.loads(json.dumps(data)) if data is not None else None
+
+    def update(self, session_id, **fields):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id].update(json.loads(json.dumps(fields)))
+                self._updated_at[session_id] = time.time()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._updated_at.pop(session_id, None)
+            self._events.pop(session_id, None)
+
+    def list(self, status=None):
+        with self._lock:
+            return [
+                json.loads(json.dumps(data)) for data in self._sessions.values()
+                if status is None or data.get("status") == status
+            ]
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [session_id for session_id, updated_at in self._updated_at.items() if updated_at < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+                del self._updated_at[session_id]
+                self._events.pop(session_id, None)
+        return expired
+
+    def append_event(self, session_id, event, data):
+        with self._lock:
+            self._last_event_id += 1
+            self._events.setdefault(session_id, []).append({
+                "id": self._last_event_id,
+                "event": event,
+                "data": json.loads(json.dumps(data))
+            })
+            return self._last_event_id
+
+    def events_since(self, session_id, after_id=0, limit=100):
+        with self._lock:
+            events = [event for event in self._events.get(session_id, []) if event["id"] > after_id]
+            return json.loads(json.dumps(events[:limit]))
+
+
+class SQLiteSessionStore(SessionStore):
+    def __init__(self, db_path="./sessions.db", ttl_seconds=24 * 3600):
+        """
+        On-disk store shared by every uvicorn worker on the host
+
+        Uses WAL mode so readers never block the pipeline's writes, one
+        connection per thread, and immediate transactions for read-modify-write
+        updates so concurrent workers do not lose each other's fields.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        with connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions (status)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS session_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events (session_id, id)")
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def create(self, session_id, data):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (session_id, data.get("status", ""), json.dumps(data), now, now)
+        )
+
+    def get(self, session_id):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, session_id, **fields):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT data FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row:
+                data = json.loads(row[0])
+                data.update(fields)
+                connection.execute(
+                    "UPDATE sessions SET status = ?, data = ?, updated_at = ? WHERE session_id = ?",
+                    (data.get("status", ""), json.dumps(data), time.time(), session_id)
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def delete(self, session_id):
+        connection = self._connection()
+        connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        connection.execute("DELETE FROM session_events WHERE session_id = ?", (session_id,))
+
+    def list(self, status=None):
+        if status is None:
+            rows = self._connection().execute("SELECT data FROM sessions ORDER BY created_at").fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT data FROM sessions WHERE status = ? ORDER BY created_at", (status,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in connection.execute(
+                "SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,)
+            ).fetchall()]
+            connection.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            connection.execute(
+                "DELETE FROM session_events WHERE session_id NOT IN (SELECT session_id FROM sessions)"
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return expired
+
+    def append_event(self, session_id, event, data):
+        cursor = self._connection().execute(
+            "INSERT INTO session_events (session_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, event, json.dumps(data), time.time())
+        )
+        return cursor.lastrowid
+
+    def events_since(self, session_id, after_id=0, limit=100):
+        rows = self._connection().execute(
+            "SELECT id, event, data FROM session_events WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, after_id, limit)
+        ).fetchall()
+        return [{"id": row[0], "event": row[1], "data": json.loads(row[2])} for row in rows]
+
+
+def create_session_store():
+    """Build the store selected by SESSION_STORE (sqlite by default, or memory)"""
+    ttl_seconds = int(os.getenv("SESSION_TTL_HOURS", "24")) * 3600
+    if os.getenv("SESSION_STORE", "sqlite") == "memory":
+        return MemorySessionStore(ttl_seconds=ttl_seconds)
+    return SQLiteSessionStore(db_path=os.getenv("SESSION_DB_PATH", "./sessions.db"), ttl_seconds=ttl_seconds)
@@ -1,38 +1,29 @@
+from similar_certificates.template_registry import TemplateRegistry
 
-from PIL import Image
-import imagehash
+_default_registry = None
 
-def similarity_checker(final_state):
+def get_default_registry():
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = TemplateRegistry()
+    return _default_registry
 
-    img1 = Image.open("./similar_certificates/image.png")
+def similarity_checker(final_state, registry=None):
 
-    for i in final_state["human"]:
-        img2 = Image.open(f"./processed_certificates/{i}")
+    registry = registry or get_default_registry()
+    artifacts = final_state["artifacts"]
 
-        hash1 = imagehash.phash(img1)
-        hash2 = imagehash.phash(img2)
+    # Photos are noisier than e-certificates, so they get a lower threshold
+    for certificates, threshold in [(final_state["human"], 0.58), (final_state["ecerti"], 0.9)]:
+        for i in certificates:
+            template, similarity = registry.best_match(artifacts.pil(i))
 
-        distance = hash1 - hash2
-        similarity = 1 - distance / (len(hash1.hash) ** 2)
+            final_state["template_matches"][i] = {"template": template, "similarity": round(similarity, 4)}
 
-        if similarity > 0.58:
-            final_state["accepted_certi"].append(i)
-        else:
-            final_state["rejected_certi"].append(i)
-
-    for i in final_state["ecerti"]:
-        img2 = Image.open(f"./processed_certificates/{i}")
-
-        hash1 = imagehash.phash(img1)
-        hash2 = imagehash.phash(img2)
-
-        distance = hash1 - hash2
-        similarity = 1 - distance / (len(hash1.hash) ** 2)
-
-        if similarity > 0.9:
-            final_state["accepted_certi"].append(i)
-        else:
-            final_state["rejected_certi"].append(i)
+            if similarity > threshold:
+                final_state["accepted_certi"].append(i)
+            else:
+                final_state["rejected_certi"].append(i)
 
     return final_state
 
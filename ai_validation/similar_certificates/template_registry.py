@@ -0,0 +1,66 @@
+import os
+import numpy as np
+from PIL import Image
+import imagehash
+
+TEMPLATE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.webp'}
+
+
+class TemplateRegistry:
+    def __init__(self, template_dir="./similar_certificates/templates", extra_templates=("./similar_certificates/image.png",)):
+        """
+        Perceptual hashes of every reference certificate layout, computed once
+
+        Templates are found recursively under template_dir; a template's name is
+        its path relative to template_dir without the extension, so
+        templates/<institution>/<layout>.png is reported as "<institution>/<layout>".
+
+        Args:
+            template_dir: Folder holding one image per institution layout
+            extra_templates: Individual template images outside template_dir
+        """
+        self.template_dir = template_dir
+        self.names = []
+        hashes = []
+
+        template_paths = [(os.path.splitext(os.path.basename(path))[0], path) for path in extra_templates if os.path.exists(path)]
+        if os.path.isdir(template_dir):
+            for root, dirs, files in os.walk(template_dir):
+                for file in sorted(files):
+                    if os.path.splitext(file)[1].lower() in TEMPLATE_EXTENSIONS:
+                        path = os.path.join(root, file)
+                        name = os.path.splitext(os.path.relpath(path, template_dir))[0].replace(os.sep, "/")
+                        template_paths.append((name, path))
+
+        for name, path in template_paths:
+            try:
+                with Image.open(path) as img:
+                    hashes.append(self.hash_image(img))
+                self.names.append(name)
+            except Exception as e:
+                print(f"Could not load template {path}: {e}")
+
+        # One packed 64-bit pHash per template
+        self.hashes = np.array(hashes, dtype=np.uint64)
+        print(f"Loaded {len(self.names)} certificate template(s)")
+
+    @staticmethod
+    def hash_image(img):
+        """64-bit pHash of an image packed into a single uint64"""
+        bits = imagehash.phash(img).hash.flatten()
+        return np.uint64(int.from_bytes(np.packbits(bits).tobytes(), "big"))
+
+    def best_match(self, img):
+        """
+        Compare an image against every template in one vectorized pass
+
+        Returns:
+            (template name, similarity in [0, 1]) of the closest template, or (None, 0.0) when empty
+        """
+        if len(self.hashes) == 0:
+            return None, 0.0
+
+        xor = np.bitwise_xor(self.hashes, self.hash_image(img))
+        distances = np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        best = int(np.argmin(distances))
+        return self.names[best], 1 - float(distances[best]) / 64
@@ -0,0 +1,64 @@
+import pytest
+
+from record_comparison import compare_records
+
+RECORD = {
+    "enrollmentNo": "EN2021CS001",
+    "name": "Rahul Sharma",
+    "course": "Bachelor of Technology in Computer Science and Engineering",
+    "cgpa": 8.5,
+}
+
+
+def certificate(**fields):
+    return {"EnrollmentNo": "EN2021CS001", "Name": "Rahul Sharma", "Course": "B.Tech in CSE", "CGPA": "8.5", **fields}
+
+
+def test_identical_record_matches():
+    assert compare_records(RECORD, certificate())["decision"] == "match"
+
+
+def test_honorific_and_case_still_match():
+    assert compare_records(RECORD, certificate(Name="Mr. RAHUL SHARMA"))["decision"] == "match"
+
+
+def test_small_ocr_slip_in_name_still_matches():
+    assert compare_records(RECORD, certificate(Name="Rahul Sharrna"))["decision"] == "match"
+
+
+def test_different_surname_is_a_mismatch():
+    report = compare_records(RECORD, certificate(Name="Rahul Verma"))
+    assert report["decision"] == "mismatch"
+    assert report["fields"]["Name"]["agreement"] == "conflict"
+
+
+@pytest.mark.parametrize("name", ["Sharma", "Rahul", "Rahul Kumar Sharma"])
+def test_missing_or_extra_name_words_are_not_a_match(name):
+    assert compare_records(RECORD, certificate(Name=name))["decision"] == "borderline"
+
+
+@pytest.mark.parametrize("name", ["R. Sharma", "R Sharma", "Rahul S."])
+def test_initials_are_not_a_full_match(name):
+    assert compare_records(RECORD, certificate(Name=name))["decision"] == "borderline"
+
+
+def test_wrong_cgpa_is_never_a_match():
+    assert compare_records(RECORD, certificate(CGPA="7.9"))["decision"] != "match"
+
+
+def test_wrong_course_is_never_a_match():
+    assert compare_records(RECORD, certificate(Course="Master of Business Administration"))["decision"] != "match"
+
+
+def test_different_enrollment_number_is_a_mismatch():
+    assert compare_records(RECORD, certificate(EnrollmentNo="EN2021CS002"))["decision"] == "mismatch"
+
+
+def test_enrollment_separators_are_ignored():
+    assert compare_records(RECORD, certificate(EnrollmentNo="en-2021-cs001"))["decision"] == "match"
+
+
+def test_missing_name_defers_to_the_llm():
+    report = compare_records(RECORD, certificate(Name=None))
+    assert report["decision"] == "borderline"
+    assert report["score"] is None
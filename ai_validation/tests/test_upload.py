@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+pytest.importorskip("ultralytics")
+pytest.importorskip("easyocr")
+
+# Offline and self-contained; read when app is imported
+os.environ.setdefault("SESSION_STORE", "memory")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("RESULT_CACHE_ENABLED", "false")
+
+from fastapi.testclient import TestClient
+
+import app
+import workspace
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "WORKSPACES_DIR", str(tmp_path))
+    submitted = []
+
+    # Keep the pipeline out of it; only the spooling is under test
+    def submit(session_id, job, *args):
+        submitted.append((session_id, args[1]))
+        return 1
+
+    monkeypatch.setattr(app.scheduler, "submit", submit)
+    test_client = TestClient(app.app)
+    test_client.submitted = submitted
+    return test_client
+
+
+def spooled(session_id, filename):
+    with open(os.path.join(workspace.get_workspace(session_id)["certificates"], filename), "rb") as f:
+        return f.read()
+
+
+def test_upload_is_spooled(client):
+    response = client.post("/upload-certificates/", files=[("files", ("a.png", b"first image", "image/png"))])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["uploaded_files"] == ["a.png"]
+    assert spooled(body["session_id"], "a.png") == b"first image"
+
+    session_id, file_data = client.submitted[0]
+    assert session_id == body["session_id"]
+    assert file_data[0]["size"] == len(b"first image")
+
+
+def test_same_named_uploads_keep_their_own_content(client):
+    response = client.post("/upload-certificates/", files=[
+        ("files", ("x.png", b"one", "image/png")),
+        ("files", ("x.png", b"two", "image/png")),
+        ("files", ("x.png", b"one", "image/png")),
+    ])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["uploaded_files"] == ["x.png", "x_2.png"]
+    assert body["duplicate_files"] == ["x_3.png"]
+    assert spooled(body["session_id"], "x.png") == b"one"
+    assert spooled(body["session_id"], "x_2.png") == b"two"
+
+
+def test_file_over_the_limit_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(app, "MAX_FILE_BYTES", 4)
+    response = client.post("/upload-certificates/", files=[("files", ("a.png", b"too large", "image/png"))])
+    assert response.status_code == 413
+    assert client.submitted == []
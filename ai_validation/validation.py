@@ -0,0 +1,290 @@
+# validation.py
+import asyncio
+import copy
+import json
+import os
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from field_extraction import extract_fields, unresolved_fields, merge_fields
+from record_comparison import compare_records
+from metrics import FIELD_EXTRACTIONS, RECORD_COMPARISONS
+from llm_batching import (
+    EXTRACTION_FIELDS, build_extraction_messages, build_comparison_messages, run_batches, arun_batches
+)
+
+# Above 1, validation packs up to LLM_BATCH_SIZE certificates into one prompt, split to fit the token budget
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "1"))
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
+
+# Fields the rule-based extractor finds with at least this confidence are not sent to the LLM
+LOCAL_EXTRACTION_ENABLED = os.getenv("LOCAL_EXTRACTION_ENABLED", "true").lower() == "true"
+FIELD_CONFIDENCE_THRESHOLD = float(os.getenv("FIELD_CONFIDENCE_THRESHOLD", "0.8"))
+# Records scoring between the two thresholds are the only ones the LLM still compares
+LOCAL_COMPARISON_ENABLED = os.getenv("LOCAL_COMPARISON_ENABLED", "true").lower() == "true"
+COMPARISON_ACCEPT_SCORE = float(os.getenv("COMPARISON_ACCEPT_SCORE", "0.9"))
+COMPARISON_REJECT_SCORE = float(os.getenv("COMPARISON_REJECT_SCORE", "0.6"))
+CGPA_TOLERANCE = float(os.getenv("CGPA_TOLERANCE", "0.05"))
+
+EMPTY_FIELDS = {field: None for field in EXTRACTION_FIELDS}
+# What a failed or unparseable extraction stands in with; "fallback" keeps the verdict out of the result cache
+FALLBACK_FIELDS = {**EMPTY_FIELDS, "fallback": True}
+FALLBACK_COMPARISON = {"match": False, "fallback": True}
+
+def build_extraction_prompt(ocr_text):
+    return ChatPromptTemplate.from_messages([
+        ("system", """You are an assistant that extracts structured fields from OCR text of certificates.
+        Return only valid JSON with fields: EnrollmentNo, Name, Course, CGPA"""),
+        ("user", f"OCR Text: {ocr_text}")
+    ])
+
+def parse_extracted_fields(content):
+    try:
+        return json.loads(content)
+    except:
+        return dict(FALLBACK_FIELDS)
+
+def extract_locally(certificates):
+    """
+    Rule-based fields of every certificate
+
+    Returns:
+        ({certi: (fields, unresolved field names)}, certificates that still need the LLM)
+    """
+    local = {}
+    pending = []
+    for certi, ocr_text in certificates:
+        if LOCAL_EXTRACTION_ENABLED:
+            fields, confidence = extract_fields(ocr_text)
+            unresolved = unresolved_fields(confidence, FIELD_CONFIDENCE_THRESHOLD)
+        else:
+            fields, unresolved = dict(EMPTY_FIELDS), list(EXTRACTION_FIELDS)
+        local[certi] = (fields, unresolved)
+        for field in EXTRACTION_FIELDS:
+            FIELD_EXTRACTIONS.inc(field=field, method="llm" if field in unresolved else "local")
+        if unresolved:
+            print(f"Fields {unresolved} of {certi} left to the LLM")
+            pending.append((certi, ocr_text))
+    return local, pending
+
+def merge_extractions(state, local, llm_extracted):
+    """The LLM's answer only fills the fields the local extractor could not resolve"""
+    for certi, fields in llm_extracted.items():
+        if fields.get("fallback"):
+            mark_unverified(state, certi)
+    return {
+        certi: merge_fields(fields, llm_extracted.get(certi), unresolved)
+        for certi, (fields, unresolved) in local.items()
+    }
+
+def serialize_record(db_record):
+    """JSON-safe copy of a database record"""
+    db_record_copy = copy.deepcopy(db_record)
+    if "_id" in db_record_copy:
+        db_record_copy["_id"] = str(db_record_copy["_id"])
+    return db_record_copy
+
+def build_comparison_inputs(db_record, ocr_data):
+    """Prompt and variables for the "checking AI" comparison of a DB record and certificate fields"""
+    db_record_copy = serialize_record(db_record)
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are a checking AI. Check whether the data in the certificate 
+        and the data in database are same or not. If same then return true, else return false. 
+        Have strict checking for key sections like enrollment number, but you can be slightly 
+        lenient for names and other non-important sections."""),
+        ("user", "database data: {db_record_copy}, certificate data: {ocr_data}")
+    ])
+    variables = {
+        "db_record_copy": json.dumps(db_record_copy),
+        "ocr_data": json.dumps(ocr_data)
+    }
+    return prompt, variables
+
+def compare_locally(state, pairs):
+    """
+    Decide the clear-cut (database, certificate) pairs with the local comparator
+
+    Returns:
+        The borderline pairs, which still need the LLM
+    """
+    if not LOCAL_COMPARISON_ENABLED:
+        return pairs
+    
+    pending = []
+    for certi, pair in pairs:
+        report = compare_records(
+            pair["database"], pair["certificate"],
+            accept_score=COMPARISON_ACCEPT_SCORE,
+            reject_score=COMPARISON_REJECT_SCORE,
+            cgpa_tolerance=CGPA_TOLERANCE
+        )
+        state["comparisons"][certi] = report
+        RECORD_COMPARISONS.inc(decision=report["decision"])
+        if report["decision"] == "borderline":
+            print(f"Comparison of {certi} is borderline (score {report['score']}), asking the LLM")
+            pending.append((certi, pair))
+        else:
+            record_verdict(state, certi, report["decision"] == "match")
+    return pending
+
+def record_verdict(state, certi, accepted):
+    """Move a certificate to the accepted or rejected list and report the verdict right away"""
+    state["events"].verdict(certi, "accepted" if accepted else "rejected", state["sources"].get(certi))
+    if accepted:
+        if certi not in state["accepted_certi"]:
+            state["accepted_certi"].append(certi)
+        if certi in state["rejected_certi"]:
+            state["rejected_certi"].remove(certi)
+    else:
+        if certi in state["accepted_certi"]:
+            state["accepted_certi"].remove(certi)
+        if certi not in state["rejected_certi"]:
+            state["rejected_certi"].append(certi)
+
+def validate_certificates(state, llm, fetch_records):
+    """
+    Validate the OCR'd certificates against their database records
+
+    Fields the rules cannot read and records the local comparator cannot
+    settle go to the LLM, one call per certificate (or per batch when
+    LLM_BATCH_SIZE is above 1). fetch_records resolves enrollment numbers
+    to records, like database.fetch_many.
+    """
+    if LLM_BATCH_SIZE > 1:
+        return batched_validation(state, llm, fetch_records)
+    
+    certificates = list(state["ocr_texts"].items())
+    local, pending = extract_locally(certificates)
+    llm_extracted = {}
+    for certi, ocr_text in pending:
+        chain = build_extraction_prompt(ocr_text) | llm
+        response = chain.invoke({})
+        llm_extracted[certi] = parse_extracted_fields(response.content)
+    extracted = merge_extractions(state, local, llm_extracted)
+    
+    for certi, pair in compare_locally(state, lookup_records(state, certificates, extracted, fetch_records)):
+        prompt, variables = build_comparison_inputs(pair["database"], pair["certificate"])
+        chain = prompt | llm
+        output = chain.invoke(variables)
+        text = output.content.lower()
+        
+        record_verdict(state, certi, "true" in text)
+    
+    return state
+
+async def avalidate_certificates(state, llm, fetch_records, semaphore):
+    """Async variant of validate_certificates; the LLM calls run concurrently, as many as the semaphore allows"""
+    if LLM_BATCH_SIZE > 1:
+        return await abatched_validation(state, llm, fetch_records, semaphore)
+    
+    async def extract(ocr_text):
+        async with semaphore:
+            chain = build_extraction_prompt(ocr_text) | llm
+            response = await chain.ainvoke({})
+        return parse_extracted_fields(response.content)
+    
+    async def compare(pair):
+        prompt, variables = build_comparison_inputs(pair["database"], pair["certificate"])
+        async with semaphore:
+            output = await (prompt | llm).ainvoke(variables)
+        return "true" in output.content.lower()
+    
+    certificates = list(state["ocr_texts"].items())
+    local, pending = extract_locally(certificates)
+    responses = await asyncio.gather(*(extract(ocr_text) for _, ocr_text in pending), return_exceptions=True)
+    llm_extracted = {}
+    for (certi, _), ocr_data in zip(pending, responses):
+        if isinstance(ocr_data, Exception):
+            print(f"Error extracting fields from {certi}: {ocr_data}")
+            ocr_data = dict(FALLBACK_FIELDS)
+        llm_extracted[certi] = ocr_data
+    extracted = merge_extractions(state, local, llm_extracted)
+    
+    pairs = await asyncio.to_thread(lookup_records, state, certificates, extracted, fetch_records)
+    pairs = compare_locally(state, pairs)
+    verdicts = await asyncio.gather(*(compare(pair) for _, pair in pairs), return_exceptions=True)
+    
+    for (certi, _), verdict in zip(pairs, verdicts):
+        if isinstance(verdict, Exception):
+            print(f"Error validating {certi}: {verdict}")
+            mark_unverified(state, certi)
+            verdict = False
+        record_verdict(state, certi, verdict)
+    
+    return state
+
+def mark_unverified(state, certi):
+    if certi not in state["unverified"]:
+        state["unverified"].append(certi)
+
+def lookup_records(state, certificates, extracted, fetch_records):
+    """Fetch the DB records of all certificates in one query; certificates without one are rejected right away"""
+    for certi, _ in certificates:
+        ocr_data = {field: extracted[certi].get(field) for field in EXTRACTION_FIELDS}
+        state["extracted_fields"][certi] = ocr_data
+    
+    enrollment_nos = [
+        str(state["extracted_fields"][certi]["EnrollmentNo"])
+        for certi, _ in certificates
+        if state["extracted_fields"][certi]["EnrollmentNo"]
+    ]
+    records = fetch_records(enrollment_nos) if enrollment_nos else {}
+    
+    pairs = []
+    for certi, _ in certificates:
+        ocr_data = state["extracted_fields"][certi]
+        enrollmentNo = ocr_data.get("EnrollmentNo")
+        db_record = records.get(str(enrollmentNo)) if enrollmentNo else None
+        
+        if db_record:
+            pairs.append((certi, {"database": serialize_record(db_record), "certificate": ocr_data}))
+        else:
+            # Could be a lookup outage or a misread number as much as a forgery
+            mark_unverified(state, certi)
+            record_verdict(state, certi, False)
+    return pairs
+
+def record_batch_verdicts(state, pairs, compared):
+    for certi, _ in pairs:
+        if compared[certi].get("fallback"):
+            mark_unverified(state, certi)
+        record_verdict(state, certi, str(compared[certi].get("match")).lower() == "true")
+
+def batched_validation(state, llm, fetch_records):
+    """Validate certificates with one extraction and one comparison prompt per batch instead of per certificate"""
+    def invoke(messages):
+        return llm.invoke(messages).content
+    
+    certificates = list(state["ocr_texts"].items())
+    local, pending = extract_locally(certificates)
+    llm_extracted = run_batches(
+        invoke, pending, build_extraction_messages, FALLBACK_FIELDS, LLM_BATCH_SIZE, LLM_BATCH_TOKEN_BUDGET
+    )
+    extracted = merge_extractions(state, local, llm_extracted)
+    pairs = compare_locally(state, lookup_records(state, certificates, extracted, fetch_records))
+    compared = run_batches(
+        invoke, pairs, build_comparison_messages, FALLBACK_COMPARISON, LLM_BATCH_SIZE, LLM_BATCH_TOKEN_BUDGET
+    )
+    record_batch_verdicts(state, pairs, compared)
+    
+    return state
+
+async def abatched_validation(state, llm, fetch_records, semaphore):
+    async def ainvoke(messages):
+        return (await llm.ainvoke(messages)).content
+    
+    certificates = list(state["ocr_texts"].items())
+    local, pending = extract_locally(certificates)
+    llm_extracted = await arun_batches(
+        ainvoke, pending, build_extraction_messages, FALLBACK_FIELDS, LLM_BATCH_SIZE, LLM_BATCH_TOKEN_BUDGET, semaphore
+    )
+    extracted = merge_extractions(state, local, llm_extracted)
+    pairs = await asyncio.to_thread(lookup_records, state, certificates, extracted, fetch_records)
+    pairs = compare_locally(state, pairs)
+    compared = await arun_batches(
+        ainvoke, pairs, build_comparison_messages, FALLBACK_COMPARISON, LLM_BATCH_SIZE, LLM_BATCH_TOKEN_BUDGET, semaphore
+    )
+    record_batch_verdicts(state, pairs, compared)
+    
+    return state
@@ -0,0 +1,34 @@
+import os
+import shutil
+
+WORKSPACES_DIR = os.getenv("WORKSPACES_DIR", "./workspaces")
+
+WORKSPACE_FOLDERS = {
+    "certificates": "certificates",
+    "processed": "processed_certificates",
+    "accepted": "accepted_certificates",
+    "rejected": "rejected_certificates",
+}
+
+def get_workspace(session_id):
+    """Return the folder layout of a session workspace without touching the disk"""
+    root = os.path.join(WORKSPACES_DIR, session_id)
+    workspace = {"root": root}
+    for key, folder in WORKSPACE_FOLDERS.items():
+        workspace[key] = os.path.join(root, folder)
+    return workspace
+
+def create_workspace(session_id):
+    """Create an empty, isolated set of folders for a single session"""
+    workspace = get_workspace(session_id)
+    if os.path.exists(workspace["root"]):
+        shutil.rmtree(workspace["root"])
+    for key in WORKSPACE_FOLDERS:
+        os.makedirs(workspace[key], exist_ok=True)
+    return workspace
+
+def remove_workspace(session_id):
+    """Delete every file that belongs to a session"""
+    root = get_workspace(session_id)["root"]
+    if os.path.exists(root):
+        shutil.rmtree(root)
@@ -0,0 +1,70 @@
+import io
+import os
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formats that are already compressed; deflating them again only burns CPU
+STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.pdf', '.zip'}
+
+
+class ZipStreamSink(io.RawIOBase):
+    """Write-only, unseekable file that hands out whatever zipfile wrote since the last call"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(source_dir):
+    """
+    Yield a ZIP archive of every file in source_dir, built on the fly
+
+    Because the sink is not seekable, zipfile writes data descriptors after
+    each entry instead of seeking back, so nothing is buffered beyond one chunk.
+    """
+    sink = ZipStreamSink()
+    with zipfile.ZipFile(sink, "w") as zipf:
+        for file in sorted(os.listdir(source_dir)):
+            file_path = os.path.join(source_dir, file)
+            if not os.path.isfile(file_path):
+                continue
+
+            zinfo = zipfile.ZipInfo.from_file(file_path, file)
+            if os.path.splitext(file)[1].lower() in STORED_EXTENSIONS:
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+
+            with open(file_path, "rb") as src, zipf.open(zinfo, "w") as dest:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dest.write(chunk)
+                    data = sink.pop()
+                    if data:
+                        yield data
+
+            data = sink.pop()
+            if data:
+                yield data
+
+    # Central directory
+    yield sink.pop()